@@ -6,6 +6,8 @@ Purpose: Asset loading functions for the car plotter exhibit
 import os
 import pygame
 
+FONTS = {}  # fonts shared by everything that draws text, {size: pygame.font.Font}
+
 class AssetLoader:
     """
     This class is responsible for loading assets for the exhibit.
@@ -104,13 +106,25 @@ class AssetLoader:
         return pictures
 
 
-    def render(self, screen):
+    def render(self, screen, offset=(0, 0)):
         """
         Render all loaded pictures on the screen at their specified positions.
         :param screen: The screen to render the pictures on.
+        :param offset: (x, y) offset added to the positions (to render the same pictures in another part of the screen).
         """
         for _, (image, pos) in self.pictures.items():
-            screen.blit(image, pos)
+            screen.blit(image, (pos[0] + offset[0], pos[1] + offset[1]))
+
+
+def get_font(size):
+    """
+    Get the default font in the given size. Fonts are created once and shared.
+    :param size: The size of the font.
+    :return: The pygame.font.Font object.
+    """
+    if size not in FONTS:
+        FONTS[size] = pygame.font.Font(None, size)
+    return FONTS[size]
 
 
 def convert_to_pixels(value, viewport):
@@ -30,8 +30,16 @@ ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")  # directory wher
 # dict of picture names, their sizes and position to load on screen
 PICTURES_TO_LOAD = {
     "background.png": (("full", "full"), (0, 0)),
+}
+
+# dict of picture names, their sizes and position to load once per player (relative to the player's part of the screen)
+PLAYER_PICTURES_TO_LOAD = {
     "grid.png": (("70%", "70%"),("25%", "25%")),
 }
+SCORE_BAR = ("10%", "35%", "7%", "40%")  # (pos_x, pos_y, width, height) of the score bar (relative to the player's part of the screen)
+
+# players
+PLAYER_COUNT = 1  # number of players (one joystick each), the screen is split into this many columns
 
 # logging values
 LOG_FOLDER = os.path.join(os.path.dirname(__file__), "logs")  # get the path of the logs folder
@@ -40,4 +48,49 @@ BACKUP_COUNT = 10  # max number of log files, if all 10 are full, the first one
 
 # joystick values
 JOYSTICK_MAX_VALUE = 0.400  # max value of the joystick
-JOYSTICK_MIN_VALUE = 0.370  # min value of the joystick
\ No newline at end of file
+JOYSTICK_MIN_VALUE = 0.370  # min value of the joystick
+
+# main loop values
+MAX_FPS = 1000  # frame rate cap of the main loop
+
+# soak test values (see soak_test.py)
+SOAK_HOURS = 12  # default number of simulated hours to run
+SOAK_SIMULATED_FPS = 60  # frames that make up one simulated second
+SOAK_SAMPLE_MINUTES = 10  # simulated minutes between two samples in the report
+SOAK_VISIT_MINUTES = 10  # simulated minutes of scripted input at the start of every visit cycle
+SOAK_IDLE_MINUTES = 20  # simulated minutes without input after every visit (longer than IDLE_TIMEOUT, so the attract mode runs)
+SOAK_RSS_GROWTH_LIMIT = 0.10  # flag RSS growth above 10% between the first and the last samples
+SOAK_FRAME_TIME_GROWTH_LIMIT = 0.25  # flag p95 frame time growth above 25% between the first and the last samples
+SOAK_TRACEMALLOC_TOP = 10  # number of top allocators to show in the report
+
+# idle and attract mode values (see idle.py)
+IDLE_TIMEOUT = 60  # seconds without input before switching to the attract mode
+IDLE_JOYSTICK_THRESHOLD = 0.002  # joystick movement that counts as input (the joystick range is 0.370 - 0.400)
+IDLE_JOYSTICK_VARIANCE = 0.000001  # variance of the last joystick values that counts as input
+IDLE_JOYSTICK_WINDOW = 10  # number of joystick values to calculate the variance over
+ATTRACT_FPS = 10  # frame rate of the attract mode
+ATTRACT_STEP = 10  # step size for the demo car in x direction every attract mode frame
+ATTRACT_TEXT = "Move the joystick to drive!"  # hint shown in the attract mode
+
+# statistics values (see stats.py)
+STATS_ENABLED = True  # if True, every completed pass is recorded in the statistics store
+STATS_DB_FILE = os.environ.get("CARPLOT_STATS_DB", os.path.join(os.path.dirname(__file__), "stats", "stats.db"))  # path of the statistics database (the tests use a temporary one)
+STATS_BATCH_SIZE = 50  # maximum number of passes to write in one transaction
+STATS_FLUSH_INTERVAL = 5  # maximum number of seconds a pass waits before it is written
+STATS_HISTOGRAM_BUCKETS = 10  # number of buckets in the score histogram
+
+# metrics values (see metrics.py)
+METRICS_ENABLED = False  # if True, serve the exhibit metrics (Prometheus text format) over HTTP
+METRICS_HOST = "127.0.0.1"  # address of the metrics endpoint
+METRICS_PORT = 9105  # port of the metrics endpoint
+METRICS_PUBLISH_INTERVAL = 0.5  # seconds between two snapshots of the main loop
+
+# pipeline values (see pipeline.py)
+PIPELINED = False  # if True, the simulation and the frame preparation run on a worker thread, one frame ahead of the display
+PIPELINE_HANDOFF_TIMEOUT = 0.5  # seconds to wait on the frame hand-off before checking if the other thread is still running
+
+# supervisor values (see supervisor.py)
+SUPERVISOR_HEARTBEAT_TIMEOUT = 2  # seconds without a frame after which the active exhibit process is considered stalled
+SUPERVISOR_POLL_INTERVAL = 0.01  # seconds between two checks of the exhibit processes
+SUPERVISOR_READY_TIMEOUT = 60  # seconds a standby process may take to load
+SUPERVISOR_RESPAWN_DELAY = 5  # seconds to wait before starting a process again after one failed while loading
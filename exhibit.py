@@ -0,0 +1,332 @@
+"""
+Filename: exhibit.py
+Purpose: Exhibit class for the car plotter exhibit. It owns the users, the graphs and the assets,
+and runs a single frame of the exhibit (events, update, draw) so the same logic can be driven by main.py or by test harnesses.
+"""
+
+import math
+import time
+import pygame
+from pygame.locals import *
+from consts import ASSETS_DIR, PICTURES_TO_LOAD, PLAYER_PICTURES_TO_LOAD, SCORE_BAR, BLACK
+from asset_loader import AssetLoader, convert_to_pixels
+from graph import Graph
+from user import User, calc_scores
+from joystick import refresh_joysticks
+from idle import IdleDetector, AttractMode
+
+
+def cool_function(x):
+    """
+    x: in range [0, 1000]
+    returns y in range roughly [-500, 500]
+    """
+    y = 250 * math.sin(x * 0.02)                               # Base wave
+    y += 120 * math.sin(x * 0.1 + math.sin(x * 0.03))          # Nested sine wave
+    y += 90 * math.cos(x * 0.005 + math.sin(x * 0.01))         # Curvy wiggles
+    y += 70 * math.tan(math.sin(x * 0.004)) / 2                # Occasional spikes
+    y += 80 * math.exp(-((x - 700)**2) / 5000)                 # Sharp bump
+    return y
+
+
+def create_graphs(screen, sub_surface):
+    """
+    Create the list of graphs shown in the exhibit (in the order they are cycled through).
+    :param screen: The screen to draw on.
+    :param sub_surface: (pos_x, pos_y, width, height) of the sub-surface (the area where the graphs will be drawn).
+    :return: A list of Graph objects.
+    """
+    return [
+        Graph(screen, lambda x: 500 - x, (0, 1000), (-500, 500), sub_surface, title="Linear Function"),
+        Graph(screen, lambda x: -0.001 * (x)**2 + 500, (0, 1000), (-500, 500), sub_surface, title="Quadratic Function"),
+        Graph(screen, lambda x: 0.0036*(x-500)**2 - 400, (0, 1000), (-500, 500), sub_surface, title="Stop and Go"),
+        Graph(screen, lambda x: 300 * math.sin(0.02*x), (0, 1000), (-500, 500), sub_surface, title="Sine Function"),
+        Graph(screen, lambda x: 0, (0, 1000), (-500, 500), sub_surface, title="Zero Function"),
+        Graph(screen, cool_function, (0, 1000), (-500, 500), sub_surface, title="Complicated Function"),
+    ]
+
+
+class Exhibit:
+    """
+    This class holds the state of the exhibit and runs it one frame at a time.
+    The screen is split into one column per joystick, every player has its own user, grid and score bar,
+    while the graphs (sampled curves, scoring tables and rendered layers) are shared by all players.
+    """
+
+    def __init__(self, screen, view_port, joysticks, logger, stats_store=None, clock=time.monotonic):
+        """
+        Initialize the exhibit: load the assets, create the users and the graphs.
+        :param screen: The screen to draw on.
+        :param view_port: Size of the viewport (width, height).
+        :param joysticks: List of Joystick objects (or any objects with the same interface), one per player.
+        :param logger: The logger to write to.
+        :param stats_store: The StatsStore to record completed passes in (None to not record).
+        :param clock: Function that returns the current time in seconds, for the idle detection and the pass durations.
+        """
+        self.screen = screen
+        self.view_port = view_port
+        self.joysticks = joysticks
+        self.logger = logger
+        self.stats_store = stats_store
+        self.clock = clock
+
+        column_width = view_port[0] // len(joysticks)
+        self.asset_loader = AssetLoader(ASSETS_DIR, PICTURES_TO_LOAD, view_port)
+        self.player_asset_loader = AssetLoader(ASSETS_DIR, PLAYER_PICTURES_TO_LOAD, (column_width, view_port[1]))  # loaded once, rendered for every player
+        self.player_offsets = [(index * column_width, 0) for index in range(len(joysticks))]
+
+        grid_image, grid_pos = self.player_asset_loader.pictures["grid"]
+        self.sub_surfaces = [(offset_x + grid_pos[0], offset_y + grid_pos[1], grid_image.get_width(), grid_image.get_height())
+                             for offset_x, offset_y in self.player_offsets]
+
+        self.users = []
+        for (offset_x, _), sub_surface in zip(self.player_offsets, self.sub_surfaces):
+            bar = (offset_x + convert_to_pixels(SCORE_BAR[0], column_width), convert_to_pixels(SCORE_BAR[1], view_port[1]),
+                   convert_to_pixels(SCORE_BAR[2], column_width), convert_to_pixels(SCORE_BAR[3], view_port[1]))
+            self.users.append(User(screen, (0, 1000), (-500, 500), sub_surface, bar=bar))
+
+        self.graphs = create_graphs(screen, self.sub_surfaces[0])
+        self.graph_index = 0
+        self.shown_graph_index = 0  # graph of the last frame drawn, read on the display thread (see pipeline.py)
+        self.static_frame = None  # background, grids and graph of the shown graph, drawn once and copied every frame
+        self.running = True
+        self.refreshed_devices = set()  # device indices of the JOYDEVICEADDED events caused by our own refresh_joysticks
+
+        self.idle_detector = IdleDetector(clock=clock)
+        self.attract_mode = AttractMode(screen, self.draw_background, self.graphs, self.sub_surfaces)
+
+        self.pass_start_time = self.clock()
+        self.pass_input_sources = [None] * len(joysticks)  # how each player steered during the current pass, None if nobody did
+
+    def set_screen(self, screen):
+        """
+        Draw on another screen surface of the same size (after the display mode was set again, see supervisor.py).
+        :param screen: The new screen surface.
+        """
+        self.screen = screen
+        self.static_frame = None
+        self.attract_mode.screen = screen
+        for drawable in self.users + self.graphs:
+            drawable.screen = screen
+
+    def handle_event(self, event):
+        """
+        Handle a single pygame event.
+        :param event: The event to handle.
+        """
+        self.handle_system_event(event)
+        self.handle_game_event(event)
+
+    def handle_system_event(self, event, reset_pass=None):
+        """
+        Handle the parts of an event that belong to the display thread: quitting, idle detection and joystick connections.
+        Input leaves the attract mode right away, so the event that woke the exhibit up is applied to the new pass.
+        :param event: The event to handle.
+        :param reset_pass: Function that starts a new pass when leaving the attract mode (see update_attract_mode).
+        """
+        if self.idle_detector.add_event(event) and self.attract_mode.active:
+            self.update_attract_mode(reset_pass)
+
+        if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+            self.running = False
+
+        if event.type == pygame.JOYDEVICEREMOVED:
+            for joystick in self.joysticks:
+                if joystick.get_instance_id() in (event.instance_id, None):
+                    self.logger.info(f"Joystick disconnected (index {joystick.joystick_index}).")
+                    self.logger.info("Trying to reconnect...")
+                    joystick.joystick = None
+                    joystick.reconnect_waiting = True
+
+        elif event.type == pygame.JOYDEVICEADDED:
+            if event.device_index in self.refreshed_devices:
+                self.refreshed_devices.discard(event.device_index)  # sent by our own refresh, not a new device
+
+            # only refresh if a waiting joystick has a device now, otherwise every refresh would trigger the next one
+            elif any(joystick.reconnect_waiting and joystick.can_connect() for joystick in self.joysticks):
+                refresh_joysticks()  # this disconnects all the joysticks, so all of them connect again
+                self.refreshed_devices = set(range(pygame.joystick.get_count()))
+                for joystick in self.joysticks:
+                    joystick.joystick = joystick.try_connect(refresh=False)
+                    joystick.reconnect_waiting = not joystick.joystick
+
+    def handle_game_event(self, event):
+        """
+        Handle the gameplay parts of an event. The keyboard and the mouse control the first player.
+        :param event: The event to handle.
+        """
+        if event.type == KEYDOWN:
+            if event.key == K_UP:
+                self.users[0].move_y(True)
+                self.set_input_source(0, "keyboard")
+
+            elif event.key == K_DOWN:
+                self.users[0].move_y(False)
+                self.set_input_source(0, "keyboard")
+
+            elif event.key == K_LEFT:
+                self.graph_index = (self.graph_index - 1) % len(self.graphs)
+                self.reset_pass()
+
+            elif event.key == K_RIGHT:
+                self.graph_index = (self.graph_index + 1) % len(self.graphs)
+                self.reset_pass()
+
+        if event.type == pygame.MOUSEWHEEL:
+            if event.y > 0:
+                self.users[0].move_y(True)
+            else:
+                self.users[0].move_y(False)
+            self.set_input_source(0, "keyboard")
+
+    def set_input_source(self, index, input_source):
+        """
+        Remember how a player steered during the current pass (the joystick wins over the keyboard).
+        :param index: The index of the player.
+        :param input_source: "joystick" or "keyboard".
+        """
+        if self.pass_input_sources[index] != "joystick":
+            self.pass_input_sources[index] = input_source
+
+    def update(self):
+        """
+        Advance the exhibit by one frame: read the joysticks, move the users and calculate the scores.
+        When nobody uses the exhibit, advance the attract mode instead.
+        """
+        joystick_values, joystick_inputs = self.read_joysticks()
+        if self.update_attract_mode():
+            return
+        self.simulate(joystick_values, joystick_inputs)
+
+    def read_joysticks(self):
+        """
+        Read the joysticks (display thread only) and check them for input.
+        :return: (joystick_values, joystick_inputs) - list of joystick values (None for joysticks that are not connected)
+        and list of booleans, True if the joystick was moved by a player (see IdleDetector.add_joystick_value).
+        """
+        joystick_values = []
+        joystick_inputs = []
+        for index, joystick in enumerate(self.joysticks):
+            moved = False
+            if joystick.joystick:
+                joystick.get_value()
+                moved = self.idle_detector.add_joystick_value(joystick.value, index)
+            joystick_values.append(joystick.value if joystick.joystick else None)
+            joystick_inputs.append(moved)
+        return joystick_values, joystick_inputs
+
+    def update_attract_mode(self, reset_pass=None):
+        """
+        Enter the attract mode when nobody uses the exhibit and leave it on input, advancing it by one frame while it is active.
+        :param reset_pass: Function that starts a new pass on the given graph index when leaving the attract mode (self.reset_pass if None).
+        :return: True if the attract mode is active, False otherwise.
+        """
+        if self.attract_mode.active:
+            if self.idle_detector.is_idle():
+                self.attract_mode.update()
+                return True
+            self.logger.info("Input detected, leaving attract mode.")
+            self.attract_mode.stop()
+            (reset_pass or self.reset_pass)(self.attract_mode.graph_index)  # continue on the graph of the demo pass
+
+        elif self.idle_detector.is_idle():
+            self.logger.info("No input, entering attract mode.")
+            self.attract_mode.start(self.shown_graph_index)
+            return True
+
+        return False
+
+    def simulate(self, joystick_values, joystick_inputs):
+        """
+        Move the users by one step and calculate the scores.
+        This does not touch pygame, so it can run off the display thread (see pipeline.py).
+        :param joystick_values: List of joystick values from read_joysticks.
+        :param joystick_inputs: List of booleans from read_joysticks, True if the joystick was moved by a player.
+        """
+        for index, (user, joystick, value, moved) in enumerate(zip(self.users, self.joysticks, joystick_values, joystick_inputs)):
+            if value is not None:
+                user.set_y(joystick.map_value(value, 500, -500))
+            if moved:
+                self.set_input_source(index, "joystick")
+            user.add_point()
+
+        has_done_graph = any([user.move_x() for user in self.users])  # all users move together
+
+        if has_done_graph:
+            self.record_pass()
+            self.graph_index = (self.graph_index + 1) % len(self.graphs)
+
+        calc_scores(self.users, self.graphs[self.graph_index])
+
+    def reset_pass(self, graph_index=None):
+        """
+        Start a new pass (without recording the current one).
+        :param graph_index: The index of the graph to start the pass on (the current graph if None).
+        """
+        if graph_index is not None:
+            self.graph_index = graph_index
+        for user in self.users:
+            user.reset()
+        self.pass_start_time = self.clock()
+        self.pass_input_sources = [None] * len(self.users)
+
+    def record_pass(self):
+        """
+        Record the pass that was just completed on the current graph and start a new one.
+        The car keeps moving on its own, so a pass is only recorded if there was input during it,
+        and only for the players who steered (one record per player).
+        """
+        now = self.clock()
+        if self.stats_store and self.idle_detector.last_input_time > self.pass_start_time:
+            for user, input_source in zip(self.users, self.pass_input_sources):
+                if input_source:
+                    self.stats_store.record_pass(self.graphs[self.graph_index].title, user.score, now - self.pass_start_time, input_source)
+        self.pass_start_time = now
+        self.pass_input_sources = [None] * len(self.users)
+
+    def draw_background(self):
+        """
+        Draw the background pictures and the grid of every player.
+        """
+        self.asset_loader.render(self.screen)
+        for offset in self.player_offsets:
+            self.player_asset_loader.render(self.screen, offset)
+
+    def prepare_frame(self):
+        """
+        Calculate everything needed to draw the current frame.
+        This does not touch pygame, so it can run off the display thread (see pipeline.py).
+        :return: A dictionary with the graph index and the prepared frame of every user.
+        """
+        return {
+            "graph_index": self.graph_index,
+            "users": [user.prepare_frame() for user in self.users],
+        }
+
+    def render_frame(self, frame):
+        """
+        Draw a prepared frame on the screen (without flipping the display).
+        :param frame: The dictionary from prepare_frame.
+        """
+        if self.static_frame is None or frame["graph_index"] != self.shown_graph_index:
+            self.screen.fill(BLACK)
+            self.draw_background()
+            for sub_surface in self.sub_surfaces:
+                self.graphs[frame["graph_index"]].draw(sub_surface)
+            self.static_frame = self.screen.copy()  # only the shown graph is kept, a frame per graph would take too much memory
+        else:
+            self.screen.blit(self.static_frame, (0, 0))
+        self.shown_graph_index = frame["graph_index"]
+
+        for user, user_frame in zip(self.users, frame["users"]):
+            user.render_frame(user_frame)
+
+    def draw(self):
+        """
+        Draw the current frame on the screen (without flipping the display).
+        """
+        if self.attract_mode.active:
+            self.attract_mode.draw()
+            return
+
+        self.render_frame(self.prepare_frame())
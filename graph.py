@@ -9,6 +9,7 @@ import pygame
 from pygame.locals import *
 import numpy as np
 from consts import GRAPH_COLOR, GRAPH_LINE_WIDTH
+from asset_loader import get_font
 
 
 class Graph:
@@ -35,33 +36,47 @@ class Graph:
         self.color = color
         self.width = width
         self.step = step
-        
 
-    def draw(self):
+        # sampled curve, scoring table and rendered layers are calculated once and shared by everyone using the graph
+        self.xs = np.arange(self.x_range[0], self.x_range[1], self.step)
+        self.ys = np.array([self.function(x) for x in self.xs], dtype=float)
+        self.table_start = int(np.floor(self.x_range[0]))
+        self.score_table = np.array([self.function(x) for x in range(self.table_start, int(np.ceil(self.x_range[1])) + 1)], dtype=float)
+        self.layers = {}  # rendered graph layers, {(width, height): surface}
+        self.title_surface = None
+
+    def values(self, xs):
+        """
+        Get the values of the function for many x values at once, using the scoring table for whole x values in the range.
+        :param xs: Numpy array of x values.
+        :return: Numpy array of y values.
+        """
+        indices = xs - self.table_start
+        if np.all(indices == np.round(indices)) and np.all(indices >= 0) and np.all(indices < len(self.score_table)):
+            return self.score_table[indices.astype(int)]
+        return np.array([self.function(x) for x in xs], dtype=float)
+
+    def render_layer(self, width, height):
         """
-        Draw the graph on the screen.
+        Render the graph line and the axis labels on a transparent surface.
+        :param width: The width of the surface.
+        :param height: The height of the surface.
+        :return: The surface (None if there are not enough points to draw a line).
         """
+        if len(self.xs) < 2:
+            return None  # Not enough points to draw a line
 
-        pos_x, pos_y, width, height = self.sub_surface  
         graph_surface = pygame.Surface((width, height), pygame.SRCALPHA)  # Create a new surface with size of the sub-surface
         graph_surface.fill((0, 0, 0, 0))  # Fill with transparent color
 
         x_scale = width / (self.x_range[1] - self.x_range[0])  # Scale factor for x-axis
         y_scale = height / (self.y_range[1] - self.y_range[0])  # Scale factor for y-axis
 
-        # Draw the graph
-        points = []
-        for x in np.arange(self.x_range[0], self.x_range[1], self.step):
-            y = self.function(x)  # Calculate y value using the function
-            points.append((x, y))  # Append the point to the list
-        if len(points) < 2:
-            return  # Not enough points to draw a line
+        screen_points = np.column_stack((((self.xs - self.x_range[0]) * x_scale).astype(int),
+                                         ((self.ys - self.y_range[0]) * y_scale).astype(int)))  # Convert to screen coordinates
+        pygame.draw.lines(graph_surface, self.color, False, screen_points.tolist(), self.width)  # Draw the line on the graph surface
 
-        screen_points = [(int((x - self.x_range[0]) * x_scale),
-                          int((y - self.y_range[0]) * y_scale)) for x, y in points]  # Convert to screen coordinates
-        pygame.draw.lines(graph_surface, self.color, False, screen_points, self.width)  # Draw the line on the graph surface
-
-        font = pygame.font.Font(None, 24)
+        font = get_font(24)
         text_x_min = font.render(f"X: {round(self.x_range[0], 2)}", True, (0, 0, 0))
         text_x_max = font.render(f"X: {round(self.x_range[1], 2)}", True, (0, 0, 0))
         text_y_min = font.render(f"Y: {round(self.y_range[0], 2)}", True, (0, 0, 0))
@@ -71,11 +86,24 @@ class Graph:
         graph_surface.blit(text_x_max, (width - text_x_max.get_width() - 5, height - 20))
         graph_surface.blit(text_y_min, (5, height - 30))
         graph_surface.blit(text_y_max, (5, 5))
+        return graph_surface
+
+    def draw(self, sub_surface=None):
+        """
+        Draw the graph on the screen. The graph layer is rendered once per size and cached.
+        :param sub_surface: (pos_x, pos_y, width, height) to draw the graph in (the graph's own sub-surface if None).
+        """
+        pos_x, pos_y, width, height = sub_surface or self.sub_surface
+        if (width, height) not in self.layers:
+            self.layers[(width, height)] = self.render_layer(width, height)
+        graph_surface = self.layers[(width, height)]
+        if graph_surface is None:
+            return
 
         self.screen.blit(graph_surface, (pos_x, pos_y))  # Blit the graph surface onto the main screen
 
         # Draw the title
-        font = pygame.font.Font(None, 45)
-        title_surface = font.render(self.title, True, (0, 0, 0))
-        title_rect = title_surface.get_rect(center=(pos_x + width // 2, pos_y + 20))
-        self.screen.blit(title_surface, title_rect)
\ No newline at end of file
+        if self.title_surface is None:
+            self.title_surface = get_font(45).render(self.title, True, (0, 0, 0))
+        title_rect = self.title_surface.get_rect(center=(pos_x + width // 2, pos_y + 20))
+        self.screen.blit(self.title_surface, title_rect)
@@ -0,0 +1,212 @@
+"""
+Filename: idle.py
+Purpose: Idle detection and attract mode for the car plotter exhibit.
+When nobody touches the joystick or the keys for a while, the exhibit switches to a low frame rate attract mode
+that replays a demo pass along the current graph on top of a cached background frame, and wakes up immediately on input.
+"""
+
+import time
+from collections import deque
+import pygame
+from pygame.locals import *
+from consts import (IDLE_TIMEOUT, IDLE_JOYSTICK_THRESHOLD, IDLE_JOYSTICK_VARIANCE, IDLE_JOYSTICK_WINDOW,
+                    ATTRACT_FPS, ATTRACT_STEP, ATTRACT_TEXT, USER_GRAPH_COLOR, USER_GRAPH_LINE_WIDTH, BLACK, YELLOW)
+from asset_loader import get_font
+
+INPUT_EVENTS = (KEYDOWN, pygame.MOUSEWHEEL, pygame.MOUSEBUTTONDOWN, pygame.JOYBUTTONDOWN)  # events that count as user input
+
+
+class IdleDetector:
+    """
+    This class detects when nobody is using the exhibit, based on the event queue and the joystick values.
+    """
+
+    def __init__(self, timeout=IDLE_TIMEOUT, threshold=IDLE_JOYSTICK_THRESHOLD, variance=IDLE_JOYSTICK_VARIANCE, window=IDLE_JOYSTICK_WINDOW,
+                 clock=time.monotonic):
+        """
+        Initialize the idle detector.
+        :param timeout: Seconds without input after which the exhibit is idle.
+        :param threshold: Joystick movement (from the last position that counted as input) that counts as input.
+        :param variance: Variance of the last joystick values that counts as input.
+        :param window: Number of joystick values to calculate the variance over.
+        :param clock: Function that returns the current time in seconds (the soak test uses a simulated clock).
+        """
+        self.timeout = timeout
+        self.threshold = threshold
+        self.variance = variance
+        self.window = window
+        self.clock = clock
+        self.values = {}  # last joystick values, {joystick index: deque}
+        self.reference_values = {}  # joystick value at the last input, {joystick index: value}
+        self.last_input_time = self.clock()
+
+    def notify_input(self):
+        """
+        Mark that the user did something right now.
+        """
+        self.last_input_time = self.clock()
+
+    def add_event(self, event):
+        """
+        Check if an event is user input.
+        :param event: The pygame event.
+        :return: True if the event counts as user input, False otherwise.
+        """
+        if event.type in INPUT_EVENTS:
+            self.notify_input()
+            return True
+        return False
+
+    def add_joystick_value(self, value, joystick_index=0):
+        """
+        Check if a new joystick value means that the joystick is being used.
+        Small noise around a resting position does not count as input.
+        :param value: The joystick value.
+        :param joystick_index: The index of the joystick (every joystick rests at its own position).
+        :return: True if the value counts as user input, False otherwise.
+        """
+        values = self.values.setdefault(joystick_index, deque(maxlen=self.window))
+        values.append(value)
+
+        if joystick_index not in self.reference_values:
+            self.reference_values[joystick_index] = value
+            return False
+
+        moved = abs(value - self.reference_values[joystick_index]) > self.threshold
+        if not moved and len(values) == values.maxlen:
+            mean = sum(values) / len(values)
+            moved = sum((v - mean) ** 2 for v in values) / len(values) > self.variance
+
+        if moved:
+            self.reference_values[joystick_index] = value
+            values.clear()
+            self.notify_input()
+        return moved
+
+    def is_idle(self):
+        """
+        :return: True if there was no input for longer than the timeout, False otherwise.
+        """
+        return self.clock() - self.last_input_time > self.timeout
+
+
+class AttractMode:
+    """
+    This class runs the attract mode: a demo pass along the current graph (in every player's part of the screen) at a low frame rate.
+    The background (assets, graph and hint text) is rendered once per graph and cached, each frame only draws the demo line on top of it.
+    """
+
+    def __init__(self, screen, draw_background, graphs, sub_surfaces, fps=ATTRACT_FPS, step=ATTRACT_STEP):
+        """
+        Initialize the attract mode.
+        :param screen: The screen to draw on.
+        :param draw_background: Function that draws the background pictures on the screen.
+        :param graphs: The list of graphs to cycle through.
+        :param sub_surfaces: List of (pos_x, pos_y, width, height) of the sub-surfaces where the graphs are drawn.
+        :param fps: The frame rate of the attract mode.
+        :param step: Step size in x direction every frame of the demo pass.
+        """
+        self.screen = screen
+        self.draw_background = draw_background
+        self.graphs = graphs
+        self.sub_surfaces = sub_surfaces
+        self.fps = fps
+        self.step = step
+
+        self.active = False
+        self.graph_index = 0
+        self.frame = 0
+        self.background = None  # cached background frame of the current graph
+        self.demo_points = []  # screen points of the demo pass along the current graph, one list per sub-surface
+
+    def start(self, graph_index):
+        """
+        Start the attract mode on the given graph.
+        :param graph_index: The index of the graph to start with.
+        """
+        self.active = True
+        self.set_graph(graph_index)
+
+    def stop(self):
+        """
+        Stop the attract mode and free the cached frame.
+        """
+        self.active = False
+        self.background = None
+        self.demo_points = []
+
+    def set_graph(self, graph_index):
+        """
+        Switch the demo pass to another graph and cache its background frame.
+        :param graph_index: The index of the graph.
+        """
+        self.graph_index = graph_index
+        self.frame = 0
+
+        graph = self.graphs[graph_index]
+        self.screen.fill(BLACK)
+        self.draw_background()
+        for sub_surface in self.sub_surfaces:
+            graph.draw(sub_surface)
+
+        text_surface = get_font(60).render(ATTRACT_TEXT, True, YELLOW)
+        text_rect = text_surface.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() - 40))
+        self.screen.blit(text_surface, text_rect)
+        self.background = self.screen.copy()
+
+        self.demo_points = []
+        xs = list(range(graph.x_range[0], graph.x_range[1] + 1, self.step))
+        ys = [graph.function(x) for x in xs]
+        for pos_x, pos_y, width, height in self.sub_surfaces:
+            x_scale = width / (graph.x_range[1] - graph.x_range[0])
+            y_scale = height / (graph.y_range[1] - graph.y_range[0])
+            self.demo_points.append([(pos_x + int((x - graph.x_range[0]) * x_scale), pos_y + int((y - graph.y_range[0]) * y_scale))
+                                     for x, y in zip(xs, ys)])
+
+    def update(self):
+        """
+        Advance the demo pass by one frame, moving to the next graph when the pass is done.
+        :return: The index of the graph shown in the attract mode.
+        """
+        self.frame += 1
+        if self.frame >= len(self.demo_points[0]):
+            self.set_graph((self.graph_index + 1) % len(self.graphs))
+        return self.graph_index
+
+    def draw(self):
+        """
+        Draw the current frame of the attract mode.
+        """
+        self.screen.blit(self.background, (0, 0))
+        for demo_points in self.demo_points:
+            points = demo_points[:self.frame + 1]
+            if len(points) >= 2:
+                pygame.draw.lines(self.screen, USER_GRAPH_COLOR, False, points, USER_GRAPH_LINE_WIDTH)
+            pygame.draw.circle(self.screen, YELLOW, points[-1], 8)
+
+    def wait_for_events(self, idle_detector, joysticks):
+        """
+        Wait for the next attract mode frame, returning early if there is user input.
+        :param idle_detector: The IdleDetector to check the events and the joystick values with.
+        :param joysticks: The list of Joystick objects.
+        :return: The list of events received while waiting.
+        """
+        deadline = time.monotonic() + 1 / self.fps
+        events = []
+        while True:
+            remaining = int((deadline - time.monotonic()) * 1000)
+            if remaining <= 0:
+                break
+
+            event = pygame.event.wait(remaining)
+            if event.type == NOEVENT:
+                break  # timed out
+
+            received = [event] + pygame.event.get()
+            events.extend(received)
+            if any([idle_detector.add_event(e) for e in received]):
+                break
+            if any([idle_detector.add_joystick_value(joystick.get_value(), index) for index, joystick in enumerate(joysticks) if joystick.joystick]):
+                break
+
+        return events
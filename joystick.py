@@ -7,11 +7,33 @@ import pygame
 from pygame.locals import *
 from consts import JOYSTICK_MAX_VALUE, JOYSTICK_MIN_VALUE
 
+
+def refresh_joysticks():
+    """
+    Restart the joystick module so newly connected joysticks are found.
+    This invalidates all the connected pygame joysticks, so every Joystick has to call try_connect afterwards.
+    """
+    pygame.joystick.quit()
+    pygame.joystick.init()
+
+
+def create_joysticks(count, logger=None):
+    """
+    Create a Joystick for each player, refreshing the joystick module only once.
+    :param count: The number of joysticks.
+    :param logger: The logger to write to.
+    :return: The list of Joystick objects (joystick_index 0 to count - 1).
+    """
+    refresh_joysticks()
+    return [Joystick(joystick_index=index, logger=logger, refresh=False) for index in range(count)]
+
+
 class Joystick:
-    def __init__(self, joystick_index=0, logger=None, max_value=JOYSTICK_MAX_VALUE, min_value=JOYSTICK_MIN_VALUE):
+    def __init__(self, joystick_index=0, logger=None, max_value=JOYSTICK_MAX_VALUE, min_value=JOYSTICK_MIN_VALUE, refresh=True):
         """
         Initialize the joystick with the given index.
         :param joystick_index: The index of the joystick to use.
+        :param refresh: If True, restart the joystick module before connecting (see refresh_joysticks).
         """
         self.joystick_index = joystick_index
         self.logger = logger
@@ -23,29 +45,49 @@ class Joystick:
         self.reconnect_waiting = False
 
         # Try initial connect
-        joystick = self.try_connect()
+        joystick = self.try_connect(refresh)
         if not joystick:
-            self.logger.info("No joystick connected.")
+            self.logger.info(f"No joystick connected (index {self.joystick_index}).")
             self.logger.info("Trying to reconnect...")
             self.reconnect_waiting = True
 
-    def try_connect(self):
+    def try_connect(self, refresh=True):
         """
         Try to connect to the joystick.
+        :param refresh: If True, restart the joystick module first (see refresh_joysticks).
         :return: The joystick object if found, None otherwise.
         """
-        pygame.joystick.quit()
-        pygame.joystick.init()
-        if pygame.joystick.get_count() > 0:
+        if refresh:
+            refresh_joysticks()
+        if self.can_connect():
             js = pygame.joystick.Joystick(self.joystick_index)
             js.init()
-            self.logger.info("Joystick found.")
+            self.logger.info(f"Joystick found (index {self.joystick_index}).")
             self.joystick = js
             return js
         
         self.joystick = None
         return None
     
+    def can_connect(self):
+        """
+        Check if there is a device for this joystick, without connecting to it.
+        :return: True if at least joystick_index + 1 joysticks are plugged in, False otherwise.
+        """
+        return pygame.joystick.get_count() > self.joystick_index
+
+    def get_instance_id(self):
+        """
+        Get the instance id of the connected joystick (used by the JOYDEVICEREMOVED event).
+        :return: The instance id, or None if not connected.
+        """
+        if self.joystick:
+            try:
+                return self.joystick.get_instance_id()
+            except pygame.error:
+                return None
+        return None
+
     def get_value(self):
         """
         Get the value of the joystick.
@@ -4,8 +4,9 @@ Purpose: Logging functions for the car plotter exhibit
 """
 
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler
 import os
+import queue
 from consts import MAX_SIZE_PER_LOG_FILE, BACKUP_COUNT, LOG_FOLDER
 
 
@@ -30,4 +31,30 @@ def get_logger():
     )
 
     logger = logging.getLogger()
-    return logger
\ No newline at end of file
+    return logger
+
+
+def get_queue_logger(log_queue):
+    """
+    Setup logging into a multiprocessing queue instead of the log file, for processes that are started by the supervisor.
+    Only the supervisor writes to log.txt, the rotation of the file is not safe when several processes write to it.
+    :param log_queue: The queue to send the log records to (see write_queued_logs).
+    """
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    logger.handlers[:] = [QueueHandler(log_queue)]
+    return logger
+
+
+def write_queued_logs(log_queue, logger):
+    """
+    Write the log records waiting in a queue filled by get_queue_logger (without blocking).
+    :param log_queue: The queue to read the log records from.
+    :param logger: The logger to write the records to.
+    """
+    while True:
+        try:
+            record = log_queue.get_nowait()
+        except queue.Empty:
+            return
+        logger.handle(record)
@@ -3,198 +3,142 @@ File: main.py
 Purpose: Main function for the car plotter exhibit
 """
 
-import math
 import pygame
 from pygame.locals import *
 from consts import *
-from asset_loader import *
-from graph import Graph
-from user import User
 from logs import *
-from joystick import Joystick
-
-
-def main():
-
-    logger = get_logger()
-    logger.info("Starting Car Plotter Exhibit")
-    
-    pygame.init()
-    pygame.display.set_caption("Car Plot")
-    clock = pygame.time.Clock()
-    pygame.mouse.set_visible(False)
-
-    joystick = Joystick(logger=logger)
-    
-    if FULLSCREEN:
+from joystick import create_joysticks
+from exhibit import Exhibit
+from stats import StatsStore
+from metrics import MetricsServer
+from profiling import StageTimer
+from pipeline import FramePipeline
+
+
+def setup_display(fullscreen=FULLSCREEN, hidden=False):
+    """
+    Set the display mode of the exhibit.
+    :param fullscreen: If True, use the whole screen (ignoring VIEWPORT).
+    :param hidden: If True, open the window hidden in the final size (for a warm standby, see supervisor.py).
+    :return: (screen, view_port) - the screen surface and its size (width, height).
+    """
+    if fullscreen and hidden:
+        info = pygame.display.Info()  # size of the desktop, before a mode is set
+        view_port = (info.current_w, info.current_h)
+        screen = pygame.display.set_mode(view_port, pygame.HIDDEN)
+
+    elif fullscreen:
         screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
         screen_width, screen_height = pygame.display.Info().current_w, pygame.display.Info().current_h
         view_port = (screen_width, screen_height)
 
     else:
-        screen = pygame.display.set_mode(VIEWPORT)
+        screen = pygame.display.set_mode(VIEWPORT, pygame.HIDDEN if hidden else 0)
         view_port = VIEWPORT
-    
-    asset_loader = AssetLoader(ASSETS_DIR, PICTURES_TO_LOAD, view_port)
-    user = User(
-                screen,
-                (0, 1000), (-500, 500),
-                (
-                    asset_loader.pictures["grid"][1][0],
-                    asset_loader.pictures["grid"][1][1],
-                    asset_loader.pictures["grid"][0].get_width(),
-                    asset_loader.pictures["grid"][0].get_height()
-                ),
-            )
-
-    def cool_function(x):
-        """
-        x: in range [0, 1000]
-        returns y in range roughly [-500, 500]
-        """
-        y = 250 * math.sin(x * 0.02)                               # Base wave
-        y += 120 * math.sin(x * 0.1 + math.sin(x * 0.03))          # Nested sine wave
-        y += 90 * math.cos(x * 0.005 + math.sin(x * 0.01))         # Curvy wiggles
-        y += 70 * math.tan(math.sin(x * 0.004)) / 2                # Occasional spikes
-        y += 80 * math.exp(-((x - 700)**2) / 5000)                 # Sharp bump
-        return y
-    
-    # Create a graph object
-    graphs = [
-            Graph(
-                screen,
-                lambda x: 500 - x,
-                (0, 1000), (-500, 500),
-                (
-                    asset_loader.pictures["grid"][1][0],
-                    asset_loader.pictures["grid"][1][1],
-                    asset_loader.pictures["grid"][0].get_width(),
-                    asset_loader.pictures["grid"][0].get_height()
-                ),
-                title="Linear Function"
-            ),
-            Graph(
-                screen,
-                lambda x: -0.001 * (x)**2 + 500,
-                (0, 1000), (-500, 500),
-                (
-                    asset_loader.pictures["grid"][1][0],
-                    asset_loader.pictures["grid"][1][1],
-                    asset_loader.pictures["grid"][0].get_width(),
-                    asset_loader.pictures["grid"][0].get_height()
-                ),
-                title="Quadratic Function"
-            ),
-            Graph(
-                screen,
-                lambda x: 0.0036*(x-500)**2 - 400,
-                (0, 1000), (-500, 500),
-                (
-                    asset_loader.pictures["grid"][1][0],
-                    asset_loader.pictures["grid"][1][1],
-                    asset_loader.pictures["grid"][0].get_width(),
-                    asset_loader.pictures["grid"][0].get_height()
-                ),
-                title="Stop and Go"
-            ),
-            Graph(
-                screen,
-                lambda x: 300 * math.sin(0.02*x),
-                (0, 1000), (-500, 500),
-                (
-                    asset_loader.pictures["grid"][1][0],
-                    asset_loader.pictures["grid"][1][1],
-                    asset_loader.pictures["grid"][0].get_width(),
-                    asset_loader.pictures["grid"][0].get_height()
-                ),
-                title="Sine Function"
-            ),
-            Graph(
-                screen,
-                lambda x: 0,
-                (0, 1000), (-500, 500),
-                (
-                    asset_loader.pictures["grid"][1][0],
-                    asset_loader.pictures["grid"][1][1],
-                    asset_loader.pictures["grid"][0].get_width(),
-                    asset_loader.pictures["grid"][0].get_height()
-                ),
-                title="Zero Function"
-            ),
-            Graph(
-                screen,
-                cool_function,
-                (0, 1000), (-500, 500),
-                (
-                    asset_loader.pictures["grid"][1][0],
-                    asset_loader.pictures["grid"][1][1],
-                    asset_loader.pictures["grid"][0].get_width(),
-                    asset_loader.pictures["grid"][0].get_height()
-                ),
-                title="Complicated Function"
-            )]
-    graph_index = 0
-
-    # Main loop
-    running = True
-    while running:
-        for event in pygame.event.get():
-            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
-                running = False
-
-            if event.type == KEYDOWN:
-                if event.key == K_UP:
-                    user.move_y(True)
-                
-                elif event.key == K_DOWN:
-                    user.move_y(False)
-                
-                elif event.key == K_LEFT:
-                    graph_index = (graph_index - 1) % len(graphs)
-                    user.reset()
-
-                elif event.key == K_RIGHT:
-                    graph_index = (graph_index + 1) % len(graphs)
-                    user.reset()
-            
-            if event.type == pygame.MOUSEWHEEL:
-                if event.y > 0:
-                    user.move_y(True)
-                else:
-                    user.move_y(False)
 
-            if event.type == pygame.JOYDEVICEREMOVED:
-                logger.info("Joystick disconnected.")
-                logger.info("Trying to reconnect...")
-                joystick.joystick = None
-                joystick.reconnect_waiting = True
+    return screen, view_port
 
-            elif event.type == pygame.JOYDEVICEADDED:
-                if joystick.reconnect_waiting:
-                    joystick.joystick = joystick.try_connect()
-                    if joystick.joystick:
-                        joystick.reconnect_waiting = False
 
-        if joystick.joystick:
-            joystick.get_value()
-            user.set_y(joystick.map_value(joystick.value, 500, -500))
+def start_exhibit(logger, hidden=False):
+    """
+    Do everything that has to be done before the main loop: initialize pygame, find the joysticks, set the display and load the exhibit.
+    :param logger: The logger to write to.
+    :param hidden: If True, open the display hidden (see setup_display), call setup_display again and Exhibit.set_screen before running.
+    :return: (exhibit, joysticks) - the Exhibit object and the list of Joystick objects.
+    """
+    pygame.init()
+    pygame.display.set_caption("Car Plot")
+    pygame.mouse.set_visible(False)
 
-        user.add_point()
-        has_done_graph = user.move_x()
+    joysticks = create_joysticks(PLAYER_COUNT, logger)
+    screen, view_port = setup_display(hidden=hidden)
+    stats_store = StatsStore(logger=logger) if STATS_ENABLED else None
+    exhibit = Exhibit(screen, view_port, joysticks, logger, stats_store)
+    return exhibit, joysticks
+
+
+def run_main_loop(exhibit, joysticks, logger, on_frame=None):
+    """
+    Run the main loop until the exhibit is closed.
+    :param exhibit: The Exhibit object.
+    :param joysticks: The list of Joystick objects.
+    :param logger: The logger to write to.
+    :param on_frame: Function called with the frame number after every frame (used by supervisor.py for the heartbeat).
+    """
+    clock = pygame.time.Clock()
+    metrics_server = None
+    if METRICS_ENABLED:
+        try:
+            metrics_server = MetricsServer(logger=logger)
+        except OSError as e:  # e.g. the port is taken, the exhibit runs without metrics
+            logger.info(f"Could not start the metrics server ({e}), running without metrics.")
+    pipeline = FramePipeline(exhibit, logger) if PIPELINED else None  # simulation and frame preparation on a worker thread
+    stage_timer = StageTimer(("events", "update", "handoff", "draw", "flip", "wait"))
+
+    try:
+        while exhibit.running:
+            stage_timer.start()
+            if exhibit.attract_mode.active:
+                events = exhibit.attract_mode.wait_for_events(exhibit.idle_detector, joysticks)  # low frame rate, wakes on input
+            else:
+                events = pygame.event.get()
+
+            for event in events:
+                if pipeline:
+                    exhibit.handle_system_event(event, reset_pass=pipeline.reset)
+                    if event.type in (KEYDOWN, pygame.MOUSEWHEEL):
+                        pipeline.send_event(event)
+                else:
+                    exhibit.handle_event(event)
+            stage_timer.mark("events")
+
+            if pipeline:
+                joystick_values, joystick_inputs = exhibit.read_joysticks()
+                if not exhibit.update_attract_mode(reset_pass=pipeline.reset):
+                    pipeline.send_joystick_values(joystick_values, joystick_inputs)
+            else:
+                exhibit.update()
+            stage_timer.mark("update")
+
+            frame = None
+            if pipeline and not exhibit.attract_mode.active:
+                frame = pipeline.next_frame()  # prepared by the worker while the previous frame was drawn
+            stage_timer.mark("handoff")
+
+            if frame:
+                exhibit.render_frame(frame)
+            else:
+                exhibit.draw()
+            stage_timer.mark("draw")
+
+            pygame.display.flip()
+            stage_timer.mark("flip")
+            if not exhibit.attract_mode.active:
+                clock.tick(MAX_FPS)
+            stage_timer.mark("wait")
+
+            if metrics_server:
+                metrics_server.publish(stage_timer, exhibit)
+            if on_frame:
+                on_frame(stage_timer.frame_count)
+
+    finally:
+        if pipeline:
+            pipeline.close()
+        if metrics_server:
+            metrics_server.close()
+        if exhibit.stats_store:
+            exhibit.stats_store.close()
 
-        if has_done_graph:
-            graph_index = (graph_index + 1) % len(graphs)
 
-        user.calc_score(graphs[graph_index])
+def main():
 
-        screen.fill(BLACK)
-        asset_loader.render(screen)
-        graphs[graph_index].draw()
-        user.render_all()
+    logger = get_logger()
+    logger.info("Starting Car Plotter Exhibit")
 
-        pygame.display.flip()
-        clock.tick(1000)
+    exhibit, joysticks = start_exhibit(logger)
+    run_main_loop(exhibit, joysticks, logger)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,174 @@
+"""
+Filename: metrics.py
+Purpose: Local metrics endpoint for the car plotter exhibit, for fleet monitoring.
+A background thread serves the health of the exhibit (FPS, frame time percentiles, main loop stage timings, joystick state,
+current graph and memory usage) in the Prometheus text format over HTTP.
+The main loop only publishes a snapshot of raw values every METRICS_PUBLISH_INTERVAL seconds by replacing a single reference (no locks),
+all the calculations and formatting are done on the server thread when a request comes in.
+Run this file to scrape an exhibit:
+    python3 metrics.py http://127.0.0.1:9105/metrics
+"""
+
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from consts import METRICS_HOST, METRICS_PORT, METRICS_PUBLISH_INTERVAL
+from profiling import percentile, get_rss_bytes
+
+QUANTILES = (50, 90, 95, 99)  # frame time percentiles to export
+
+
+def escape_label(value):
+    """
+    Escape a label value for the Prometheus text format.
+    """
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_metrics(snapshot, start_time):
+    """
+    Format a snapshot in the Prometheus text format.
+    :param snapshot: The snapshot published by the main loop (see MetricsServer.publish).
+    :param start_time: time.time() when the server was started.
+    :return: The metrics text.
+    """
+    lines = []
+
+    def add(name, metric_type, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    add("carplot_up", "gauge", "1 if the exhibit main loop has published a snapshot.", [({}, 1 if snapshot else 0)])
+    add("carplot_uptime_seconds", "gauge", "Seconds since the metrics server was started.", [({}, round(time.time() - start_time, 3))])
+    add("carplot_memory_rss_bytes", "gauge", "Resident set size of the exhibit process.", [({}, get_rss_bytes())])
+
+    if snapshot:
+        frame_times = snapshot["frame_times"]
+        fps = len(frame_times) / sum(frame_times) if frame_times and sum(frame_times) > 0 else 0
+        add("carplot_fps", "gauge", "Frames per second over the last frames.", [({}, round(fps, 2))])
+        add("carplot_frames_total", "counter", "Number of frames since the exhibit started.", [({}, snapshot["frame_count"])])
+        add("carplot_frame_time_seconds", "gauge", "Frame time percentiles over the last frames.",
+            [({"quantile": percent / 100}, percentile(frame_times, percent)) for percent in QUANTILES])
+
+        stage_samples = []
+        for stage, stage_times in snapshot["stage_times"].items():
+            stage_samples.extend(({"stage": stage, "quantile": percent / 100}, percentile(stage_times, percent)) for percent in QUANTILES)
+        add("carplot_stage_time_seconds", "gauge", "Main loop stage time percentiles over the last frames.", stage_samples)
+
+        add("carplot_joystick_connected", "gauge", "1 if the player's joystick is connected.",
+            [({"player": player}, connected) for player, (connected, _) in enumerate(snapshot["joysticks"])])
+        add("carplot_joystick_reconnect_waiting", "gauge", "1 if the exhibit is waiting for the player's joystick to reconnect.",
+            [({"player": player}, waiting) for player, (_, waiting) in enumerate(snapshot["joysticks"])])
+        add("carplot_graph_index", "gauge", "Index of the graph being shown.", [({"title": snapshot["graph_title"]}, snapshot["graph_index"])])
+        add("carplot_attract_mode", "gauge", "1 if the exhibit is in the idle attract mode.", [({}, snapshot["attract_mode"])])
+        add("carplot_snapshot_age_seconds", "gauge", "Seconds since the main loop published the snapshot.",
+            [({}, round(time.time() - snapshot["time"], 3))])
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    This class serves the exhibit metrics over HTTP on a background thread.
+    """
+
+    def __init__(self, host=METRICS_HOST, port=METRICS_PORT, publish_interval=METRICS_PUBLISH_INTERVAL, logger=None):
+        """
+        Initialize the server and start the server thread.
+        :param host: The address to listen on (keep it local, the endpoint has no authentication).
+        :param port: The port to listen on (0 to pick a free port, see self.port).
+        :param publish_interval: Minimum number of seconds between two snapshots of the main loop.
+        :param logger: The logger to write to.
+        """
+        self.publish_interval = publish_interval
+        self.logger = logger
+        self.snapshot = None  # replaced as a whole by the main loop, only read by the server thread
+        self.next_publish_time = 0
+        self.start_time = time.time()
+
+        metrics_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = format_metrics(metrics_server.snapshot, metrics_server.start_time).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # do not write a line for every scrape
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+
+        if self.logger:
+            self.logger.info(f"Metrics server listening on http://{host}:{self.port}/metrics")
+
+    def publish(self, stage_timer, exhibit):
+        """
+        Publish a snapshot of the main loop, at most once every publish_interval seconds.
+        Only copies the raw values, everything else is done on the server thread.
+        :param stage_timer: The StageTimer of the main loop.
+        :param exhibit: The Exhibit object.
+        """
+        now = time.time()
+        if now < self.next_publish_time:
+            return
+        self.next_publish_time = now + self.publish_interval
+
+        graph_index = exhibit.attract_mode.graph_index if exhibit.attract_mode.active else exhibit.shown_graph_index
+        self.snapshot = {
+            "time": now,
+            "frame_count": stage_timer.frame_count,
+            "frame_times": tuple(stage_timer.frame_times),
+            "stage_times": {stage: tuple(times) for stage, times in stage_timer.stage_times.items()},
+            "joysticks": tuple((1 if joystick.joystick else 0, 1 if joystick.reconnect_waiting else 0) for joystick in exhibit.joysticks),
+            "graph_index": graph_index,
+            "graph_title": exhibit.graphs[graph_index].title,
+            "attract_mode": 1 if exhibit.attract_mode.active else 0,
+        }
+
+    def close(self):
+        """
+        Stop the server thread.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def scrape(url, timeout=2):
+    """
+    Scrape a metrics endpoint and parse the samples (a minimal Prometheus text format parser).
+    :param url: The URL of the endpoint.
+    :param timeout: Timeout in seconds.
+    :return: A dictionary of {sample name with labels: value}.
+    """
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        text = response.read().decode()
+
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, value = line.rsplit(" ", 1)
+        samples[name] = float(value)
+    return samples
+
+
+if __name__ == "__main__":
+    scrape_url = sys.argv[1] if len(sys.argv) > 1 else f"http://{METRICS_HOST}:{METRICS_PORT}/metrics"
+    for sample_name, sample_value in scrape(scrape_url).items():
+        print(f"{sample_name} {sample_value}")
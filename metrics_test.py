@@ -0,0 +1,67 @@
+"""
+Filename: metrics_test.py
+Purpose: Test of the metrics endpoint against the local scraper.
+Starts a MetricsServer on a free port, publishes a snapshot of a StageTimer and a stub exhibit and checks the scraped samples.
+
+Usage:
+    python3 -m pytest metrics_test.py
+"""
+
+from types import SimpleNamespace
+import pytest
+from consts import METRICS_HOST
+from metrics import MetricsServer, scrape
+from profiling import StageTimer
+
+STAGES = ("events", "update", "draw")
+
+
+def create_stub_exhibit():
+    """
+    Create an object with the attributes of the Exhibit that MetricsServer.publish reads.
+    Player 0 is connected, player 1 is waiting for its joystick to reconnect.
+    """
+    return SimpleNamespace(
+        joysticks=[SimpleNamespace(joystick=object(), reconnect_waiting=False),
+                   SimpleNamespace(joystick=None, reconnect_waiting=True)],
+        graphs=[SimpleNamespace(title="Linear Function"), SimpleNamespace(title="Sine Function")],
+        shown_graph_index=1,
+        attract_mode=SimpleNamespace(active=False, graph_index=0),
+    )
+
+
+@pytest.fixture
+def metrics_server():
+    server = MetricsServer(port=0)  # a free port
+    yield server
+    server.close()
+
+
+def test_scrape(metrics_server):
+    url = f"http://{METRICS_HOST}:{metrics_server.port}/metrics"
+    assert scrape(url)["carplot_up"] == 0  # nothing published yet
+
+    stage_timer = StageTimer(STAGES)
+    for _ in range(10):
+        stage_timer.start()
+        for stage in STAGES:
+            stage_timer.mark(stage)
+    metrics_server.publish(stage_timer, create_stub_exhibit())
+
+    samples = scrape(url)
+    assert samples["carplot_up"] == 1
+    assert samples["carplot_frames_total"] == 10
+    assert samples['carplot_joystick_connected{player="0"}'] == 1
+    assert samples['carplot_joystick_connected{player="1"}'] == 0
+    assert samples['carplot_joystick_reconnect_waiting{player="0"}'] == 0
+    assert samples['carplot_joystick_reconnect_waiting{player="1"}'] == 1
+    assert samples['carplot_graph_index{title="Sine Function"}'] == 1
+    assert samples["carplot_attract_mode"] == 0
+    for stage in STAGES:
+        for quantile in ("0.5", "0.9", "0.95", "0.99"):
+            assert samples[f'carplot_stage_time_seconds{{stage="{stage}",quantile="{quantile}"}}'] >= 0
+
+
+def test_port_in_use(metrics_server):
+    with pytest.raises(OSError):  # main.run_main_loop catches this and runs without metrics
+        MetricsServer(port=metrics_server.port)
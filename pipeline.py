@@ -0,0 +1,130 @@
+"""
+Filename: pipeline.py
+Purpose: Pipelined frame production for the car plotter exhibit.
+A worker thread advances the simulation and prepares the next frame's draw data (screen-space points, scores, bar heights and labels),
+while the display thread only handles events, reads the joysticks, blits and presents.
+The frames are handed over through a single slot, so the worker is at most one frame ahead of the display.
+"""
+
+import queue
+import threading
+from consts import PIPELINE_HANDOFF_TIMEOUT
+
+
+class FramePipeline:
+    """
+    This class runs Exhibit.simulate and Exhibit.prepare_frame on a worker thread.
+    While the pipeline runs, the users, the graph index and the pass state of the exhibit belong to the worker thread,
+    the display thread only changes them by sending inputs (and uses Exhibit.shown_graph_index instead of the graph index).
+    """
+
+    def __init__(self, exhibit, logger=None):
+        """
+        Initialize the pipeline and start the worker thread.
+        :param exhibit: The Exhibit object.
+        :param logger: The logger to write to.
+        """
+        self.exhibit = exhibit
+        self.logger = logger
+
+        self.inputs = queue.Queue()  # (kind, value) inputs from the display thread
+        self.frames = queue.Queue(maxsize=1)  # single slot hand-off of the prepared frames
+        self.generation = 0  # increased on every reset, frames prepared before a reset are dropped
+        self.running = True
+        self.error = None  # exception raised on the worker thread, raised again on the display thread
+
+        self.thread = threading.Thread(target=self.run, name="frame-pipeline", daemon=True)
+        self.thread.start()
+
+    def send_event(self, event):
+        """
+        Send a gameplay event to the worker (see Exhibit.handle_game_event).
+        :param event: The pygame event.
+        """
+        self.inputs.put(("event", event))
+
+    def send_joystick_values(self, joystick_values, joystick_inputs):
+        """
+        Send the joystick values to use for the next simulation step.
+        :param joystick_values: List of joystick values from Exhibit.read_joysticks.
+        :param joystick_inputs: List of booleans from Exhibit.read_joysticks, True if the joystick was moved by a player.
+        """
+        self.inputs.put(("joysticks", (joystick_values, joystick_inputs)))
+
+    def reset(self, graph_index):
+        """
+        Start a new pass on the given graph, dropping the frames that were already prepared.
+        :param graph_index: The index of the graph.
+        """
+        self.generation += 1
+        self.inputs.put(("reset", (graph_index, self.generation)))
+
+    def next_frame(self):
+        """
+        Wait for the next prepared frame.
+        :return: The frame dictionary (see Exhibit.prepare_frame).
+        """
+        while True:
+            try:
+                frame = self.frames.get(timeout=PIPELINE_HANDOFF_TIMEOUT)
+            except queue.Empty:
+                if self.error:
+                    raise self.error
+                continue
+            if frame["generation"] == self.generation:
+                return frame
+
+    def close(self):
+        """
+        Stop the worker thread.
+        """
+        self.running = False
+        self.inputs.put(("close", None))  # wake the worker up in case it is waiting for inputs
+        try:
+            self.frames.get_nowait()  # free the slot in case the worker is waiting on it
+        except queue.Empty:
+            pass
+        self.thread.join()
+
+    def put_frame(self, generation):
+        """
+        Prepare a frame of the current state and hand it over to the display thread (waits while the slot is taken).
+        :param generation: The generation of the frame (see reset).
+        """
+        frame = self.exhibit.prepare_frame()
+        frame["generation"] = generation
+
+        while self.running:
+            try:
+                self.frames.put(frame, timeout=PIPELINE_HANDOFF_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        """
+        The worker thread: apply the inputs, and for every joystick values sent by the display thread advance the simulation
+        and prepare the next frame. The first frame (and the first frame after a reset) is prepared without waiting,
+        so the display shows a frame while the worker simulates the next one, exactly one frame behind the input.
+        """
+        generation = 0
+
+        try:
+            self.put_frame(generation)
+            while self.running:
+                kind, value = self.inputs.get()
+
+                if kind == "event":
+                    self.exhibit.handle_game_event(value)
+                elif kind == "reset":
+                    graph_index, generation = value
+                    self.exhibit.reset_pass(graph_index)
+                    self.put_frame(generation)
+                elif kind == "joysticks":
+                    self.exhibit.simulate(*value)  # the values read by the display thread for this frame
+                    self.put_frame(generation)
+
+        except Exception as e:
+            if self.logger:
+                self.logger.exception("Frame pipeline worker failed.")
+            self.error = e
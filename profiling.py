@@ -0,0 +1,186 @@
+"""
+Filename: profiling.py
+Purpose: Profiling helpers for the car plotter exhibit (frame timing, percentiles and memory usage).
+"""
+
+import os
+import time
+from collections import deque
+
+
+def percentile(values, percent):
+    """
+    Calculate a percentile of a list of values (nearest-rank method).
+    :param values: The values (do not have to be sorted).
+    :param percent: The percentile to calculate (0 to 100).
+    :return: The percentile value, or 0 if there are no values.
+    """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = int(round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def get_rss_bytes():
+    """
+    Get the resident set size (RSS) of the current process.
+    Uses /proc on Linux (the kiosk), falls back to the peak RSS from the resource module elsewhere.
+    :return: The RSS in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if peak > 1 << 32 else peak * 1024  # macOS reports bytes, Linux reports KB
+    except ImportError:
+        return 0
+
+
+class FrameTimer:
+    """
+    This class keeps the durations of the last frames, so percentiles can be calculated over a sliding window.
+    """
+
+    def __init__(self, window=1000):
+        """
+        Initialize the frame timer.
+        :param window: The number of frames to keep.
+        """
+        self.frame_times = deque(maxlen=window)  # frame durations in seconds
+        self.frame_start = None
+
+    def start(self):
+        """
+        Mark the start of a frame.
+        """
+        self.frame_start = time.perf_counter()
+
+    def stop(self):
+        """
+        Mark the end of a frame and store its duration.
+        :return: The duration of the frame in seconds.
+        """
+        duration = time.perf_counter() - self.frame_start
+        self.frame_times.append(duration)
+        return duration
+
+    def percentiles(self, percents=(50, 95, 99)):
+        """
+        Calculate percentiles of the stored frame durations.
+        :param percents: The percentiles to calculate.
+        :return: A dictionary of {percent: duration in seconds}.
+        """
+        values = list(self.frame_times)
+        return {percent: percentile(values, percent) for percent in percents}
+
+    def clear(self):
+        """
+        Clear the stored frame durations.
+        """
+        self.frame_times.clear()
+
+
+class FrameHistogram:
+    """
+    This class counts the frame durations in fixed-size buckets instead of keeping them,
+    so percentiles can be calculated over any number of frames with a constant amount of memory (used by the soak test).
+    """
+
+    def __init__(self, bucket_size=0.00005, max_duration=1.0):
+        """
+        Initialize the frame histogram.
+        :param bucket_size: The width of a bucket in seconds (the resolution of the percentiles).
+        :param max_duration: Frames longer than this are counted in the last bucket.
+        """
+        self.bucket_size = bucket_size
+        self.counts = [0] * (int(max_duration / bucket_size) + 1)
+        self.frame_count = 0
+        self.frame_start = None
+
+    def start(self):
+        """
+        Mark the start of a frame.
+        """
+        self.frame_start = time.perf_counter()
+
+    def stop(self):
+        """
+        Mark the end of a frame and count its duration.
+        :return: The duration of the frame in seconds.
+        """
+        duration = time.perf_counter() - self.frame_start
+        self.counts[min(int(duration / self.bucket_size), len(self.counts) - 1)] += 1
+        self.frame_count += 1
+        return duration
+
+    def percentiles(self, percents=(50, 95, 99)):
+        """
+        Calculate percentiles of the counted frame durations (nearest-rank method, like percentile).
+        :param percents: The percentiles to calculate.
+        :return: A dictionary of {percent: upper edge of the bucket in seconds}.
+        """
+        result = {}
+        for percent in percents:
+            result[percent] = 0
+            rank = int(round(percent / 100 * (self.frame_count - 1)))
+            cumulative = 0
+            for index, count in enumerate(self.counts):
+                cumulative += count
+                if self.frame_count and cumulative > rank:
+                    result[percent] = (index + 1) * self.bucket_size
+                    break
+        return result
+
+    def clear(self):
+        """
+        Clear the counts (without allocating a new list).
+        """
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.frame_count = 0
+
+
+class StageTimer:
+    """
+    This class keeps the durations of the stages (events, update, draw...) of the last frames,
+    and the time between the starts of the last frames (the frame period, 1 / FPS).
+    """
+
+    def __init__(self, stages, window=1000):
+        """
+        Initialize the stage timer.
+        :param stages: The names of the stages, in the order they run in a frame.
+        :param window: The number of frames to keep.
+        """
+        self.stages = stages
+        self.stage_times = {stage: deque(maxlen=window) for stage in stages}  # stage durations in seconds
+        self.frame_times = deque(maxlen=window)  # frame periods in seconds
+        self.frame_count = 0
+        self.frame_start = None
+        self.last_mark = None
+
+    def start(self):
+        """
+        Mark the start of a frame.
+        """
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frame_times.append(now - self.frame_start)
+        self.frame_start = now
+        self.last_mark = now
+        self.frame_count += 1
+
+    def mark(self, stage):
+        """
+        Mark the end of a stage of the current frame and store its duration.
+        :param stage: The name of the stage that just ended.
+        """
+        now = time.perf_counter()
+        self.stage_times[stage].append(now - self.last_mark)
+        self.last_mark = now
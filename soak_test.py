@@ -0,0 +1,347 @@
+"""
+Filename: soak_test.py
+Purpose: Headless soak test for the car plotter exhibit.
+Runs the exhibit main loop for a number of simulated hours with scripted input, cycling through all graphs,
+with stretches without input (longer than IDLE_TIMEOUT) so the attract mode runs as well,
+and tracks the RSS, the top tracemalloc allocators and the frame time percentiles over time.
+At the end a trend report is printed (and logged) that flags memory or frame time growth.
+
+Usage:
+    python3 soak_test.py --hours 12 --csv soak.csv
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # run headless
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import csv
+import math
+import random
+import sys
+import tracemalloc
+import pygame
+import profiling
+from pygame.locals import *
+from consts import *
+from logs import get_logger
+from joystick import Joystick
+from exhibit import Exhibit
+from profiling import FrameHistogram, get_rss_bytes
+
+
+class SimulatedClock:
+    """
+    Clock of the simulated time, advanced by the soak test after every frame (instead of waiting in real time).
+    """
+
+    def __init__(self):
+        """
+        Initialize the clock at 0 seconds.
+        """
+        self.now = 0.0
+
+    def __call__(self):
+        """
+        :return: The simulated time in seconds.
+        """
+        return self.now
+
+    def advance(self, seconds):
+        """
+        Advance the simulated time.
+        :param seconds: Number of seconds to advance.
+        """
+        self.now += seconds
+
+
+def is_visited(second):
+    """
+    Check if somebody uses the exhibit at the given simulated second (see SOAK_VISIT_MINUTES and SOAK_IDLE_MINUTES).
+    :param second: The simulated second.
+    :return: True during a visit, False during the idle stretch after it.
+    """
+    return second % ((SOAK_VISIT_MINUTES + SOAK_IDLE_MINUTES) * 60) < SOAK_VISIT_MINUTES * 60
+
+
+class ScriptedJoystick:
+    """
+    Stand-in for the Joystick class that replays a scripted analog input instead of reading a device.
+    """
+
+    def __init__(self, joystick_index=0, seed=0, min_value=JOYSTICK_MIN_VALUE, max_value=JOYSTICK_MAX_VALUE):
+        """
+        Initialize the scripted joystick.
+        :param joystick_index: The index of the joystick (also used as its instance id).
+        :param seed: Seed for the random noise added to the input.
+        :param min_value: The minimum value of the joystick.
+        :param max_value: The maximum value of the joystick.
+        """
+        self.joystick_index = joystick_index
+        self.min_value = min_value
+        self.max_value = max_value
+        self.random = random.Random(seed)
+
+        self.joystick = True
+        self.value = 0
+        self.reconnect_waiting = False
+        self.moving = True  # False while nobody uses the exhibit, the joystick then rests with some noise
+        self.reads = 0
+
+    map_value = Joystick.map_value
+
+    def try_connect(self, refresh=True):
+        """
+        Reconnect the scripted joystick (always succeeds).
+        :return: True
+        """
+        self.joystick = True
+        return True
+
+    def can_connect(self):
+        """
+        :return: True (the scripted joystick is always plugged in).
+        """
+        return True
+
+    def get_instance_id(self):
+        """
+        :return: The instance id of the scripted joystick, or None if not connected.
+        """
+        return self.joystick_index if self.joystick else None
+
+    def get_value(self):
+        """
+        Get the next scripted value: a slow wandering wave around the middle of the range plus some noise.
+        While the joystick is not moving, the wave stays where it is and only the noise changes the value.
+        :return: The value of the joystick.
+        """
+        if self.moving:
+            self.reads += 1
+        middle = (self.max_value + self.min_value) / 2
+        amplitude = (self.max_value - self.min_value) / 2
+        wave = math.sin(self.reads * 0.01 + self.joystick_index) * 0.7 + math.sin(self.reads * 0.037) * 0.3
+        noise = self.random.uniform(-0.05, 0.05)
+        self.value = round(middle + amplitude * (wave + noise), 4)
+        return self.value
+
+
+def post_scripted_events(second, rng):
+    """
+    Post the scripted keyboard, mouse and joystick events for the given simulated second (nothing during the idle stretches).
+    :param second: The simulated second that just started.
+    :param rng: random.Random object used to vary the input.
+    """
+    if not is_visited(second):
+        return
+
+    if second % 7 == 0:  # a short burst of key presses
+        key = K_UP if rng.random() < 0.5 else K_DOWN
+        for _ in range(rng.randint(1, 5)):
+            pygame.event.post(pygame.event.Event(KEYDOWN, key=key))
+
+    if second % 11 == 0:
+        pygame.event.post(pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=rng.choice((-1, 1))))
+
+    if second % 180 == 90:  # switch graph by hand every 3 simulated minutes
+        pygame.event.post(pygame.event.Event(KEYDOWN, key=rng.choice((K_LEFT, K_RIGHT))))
+
+    if second % 1800 == 300:  # unplug the joystick every 30 simulated minutes, plug it back 5 seconds later
+        pygame.event.post(pygame.event.Event(pygame.JOYDEVICEREMOVED, instance_id=0))
+    elif second % 1800 == 305:
+        pygame.event.post(pygame.event.Event(pygame.JOYDEVICEADDED, device_index=0))
+
+
+def linear_slope(xs, ys):
+    """
+    Calculate the slope of the least squares line through the given points.
+    :return: The slope (0 if it cannot be calculated).
+    """
+    if len(xs) < 2:
+        return 0
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return 0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def growth(values):
+    """
+    Calculate the relative growth between the first and the last quarter of the values.
+    :return: The growth as a fraction (0.1 means 10% growth).
+    """
+    if len(values) < 2:
+        return 0
+    quarter = max(1, len(values) // 4)
+    first = sum(values[:quarter]) / quarter
+    last = sum(values[-quarter:]) / quarter
+    if first == 0:
+        return 0
+    return (last - first) / first
+
+
+def take_snapshot():
+    """
+    Take a tracemalloc snapshot without the allocations of the soak test itself (and of tracemalloc),
+    so the report shows the allocations of the exhibit.
+    :return: The filtered snapshot.
+    """
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, profiling.__file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ))
+
+
+def take_sample(seconds, attract_seconds, sample_seconds, timer, use_tracemalloc):
+    """
+    Take a sample of the memory usage and the frame times since the last sample.
+    :param seconds: The simulated time in seconds.
+    :param attract_seconds: Simulated seconds spent in the attract mode since the last sample.
+    :param sample_seconds: Simulated seconds since the last sample.
+    :return: A dictionary with the sample values.
+    """
+    frame_percentiles = timer.percentiles()
+    sample = {
+        "hours": seconds / 3600,
+        "attract_pct": 100 * attract_seconds / sample_seconds,
+        "rss_mb": get_rss_bytes() / (1024 * 1024),
+        "traced_mb": 0,
+        "p50_ms": frame_percentiles[50] * 1000,
+        "p95_ms": frame_percentiles[95] * 1000,
+        "p99_ms": frame_percentiles[99] * 1000,
+        "top_allocator": "",
+    }
+    if use_tracemalloc:
+        top = take_snapshot().statistics("lineno")
+        sample["traced_mb"] = sum(stat.size for stat in top) / (1024 * 1024)
+        if top:
+            sample["top_allocator"] = f"{top[0].traceback} ({top[0].size / 1024:.1f} KB)"
+    return sample
+
+
+def report(samples, graphs_seen, graph_count, baseline_snapshot, logger):
+    """
+    Print and log the trend report.
+    :return: True if growth was flagged, False otherwise.
+    """
+    lines = ["Soak test report", "hours  attract[%]  rss[MB]  traced[MB]  p50[ms]  p95[ms]  p99[ms]  top allocator"]
+    for sample in samples:
+        lines.append(f"{sample['hours']:6.2f}  {sample['attract_pct']:10.1f}  {sample['rss_mb']:7.1f}  {sample['traced_mb']:10.2f}  "
+                     f"{sample['p50_ms']:7.2f}  {sample['p95_ms']:7.2f}  {sample['p99_ms']:7.2f}  {sample['top_allocator']}")
+
+    flagged = False
+    trend_samples = samples[1:] if len(samples) > 2 else samples  # the first sample includes the warm up
+    hours = [sample["hours"] for sample in trend_samples]
+    for key, limit in (("rss_mb", SOAK_RSS_GROWTH_LIMIT), ("traced_mb", SOAK_RSS_GROWTH_LIMIT), ("p95_ms", SOAK_FRAME_TIME_GROWTH_LIMIT)):
+        values = [sample[key] for sample in trend_samples]
+        value_growth = growth(values)
+        slope = linear_slope(hours, values)
+        status = "OK"
+        if value_growth > limit:
+            status = "GROWTH"
+            flagged = True
+        lines.append(f"{key}: growth {value_growth * 100:+.1f}% (limit {limit * 100:.0f}%), slope {slope:+.3f}/hour - {status}")
+
+    if not any(sample["attract_pct"] for sample in samples):
+        lines.append(f"The attract mode never ran - run longer than {SOAK_VISIT_MINUTES} simulated minutes to cover it")
+
+    if len(graphs_seen) < graph_count:
+        lines.append(f"Only {len(graphs_seen)} of {graph_count} graphs were shown - run longer to cover all of them")
+
+    if baseline_snapshot is not None:
+        lines.append(f"Top {SOAK_TRACEMALLOC_TOP} allocation growth since the first sample:")
+        diff = take_snapshot().compare_to(baseline_snapshot, "lineno")
+        for stat in diff[:SOAK_TRACEMALLOC_TOP]:
+            lines.append(f"  {stat}")
+
+    for line in lines:
+        print(line)
+        logger.info(line)
+
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless soak test for the car plotter exhibit.")
+    parser.add_argument("--hours", type=float, default=SOAK_HOURS, help="number of simulated hours to run")
+    parser.add_argument("--fps", type=int, default=SOAK_SIMULATED_FPS, help="frames in one simulated second")
+    parser.add_argument("--sample-minutes", type=float, default=SOAK_SAMPLE_MINUTES, help="simulated minutes between samples")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the scripted input")
+    parser.add_argument("--players", type=int, default=PLAYER_COUNT, help="number of players (scripted joysticks)")
+    parser.add_argument("--csv", help="write the samples to this CSV file")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="do not track allocations (lower overhead)")
+    args = parser.parse_args()
+
+    logger = get_logger()
+    logger.info(f"Starting soak test: {args.hours} simulated hours at {args.fps} FPS with {args.players} players")
+
+    use_tracemalloc = not args.no_tracemalloc
+    if use_tracemalloc:
+        tracemalloc.start()
+
+    pygame.init()
+    screen = pygame.display.set_mode(VIEWPORT)
+    joysticks = [ScriptedJoystick(joystick_index=index, seed=args.seed + index) for index in range(args.players)]
+    clock = SimulatedClock()
+    exhibit = Exhibit(screen, VIEWPORT, joysticks, logger, clock=clock)
+
+    rng = random.Random(args.seed)
+    timer = FrameHistogram()  # constant memory, however many frames a sample has
+    total_seconds = args.hours * 3600
+    sample_seconds = max(1 / args.fps, args.sample_minutes * 60)
+    next_sample_time = sample_seconds
+    attract_seconds = 0
+    second = -1
+    samples = []
+    graphs_seen = set()
+    baseline_snapshot = None
+
+    while clock.now < total_seconds:
+        if int(clock.now) != second:
+            second = int(clock.now)
+            post_scripted_events(second, rng)
+            for joystick in joysticks:
+                joystick.moving = is_visited(second)
+
+        timer.start()
+        for event in pygame.event.get():
+            exhibit.handle_event(event)
+        exhibit.update()
+        exhibit.draw()
+        pygame.display.flip()
+        timer.stop()
+
+        graphs_seen.add(exhibit.graph_index)
+
+        # the main loop runs at ATTRACT_FPS in the attract mode (see AttractMode.wait_for_events)
+        frame_seconds = 1 / ATTRACT_FPS if exhibit.attract_mode.active else 1 / args.fps
+        if exhibit.attract_mode.active:
+            attract_seconds += frame_seconds
+        clock.advance(frame_seconds)
+
+        if clock.now >= next_sample_time:
+            samples.append(take_sample(clock.now, attract_seconds, sample_seconds, timer, use_tracemalloc))
+            next_sample_time += sample_seconds
+            attract_seconds = 0
+            timer.clear()
+            print(f"{samples[-1]['hours']:.2f} simulated hours: attract mode {samples[-1]['attract_pct']:.0f}%, RSS {samples[-1]['rss_mb']:.1f} MB, p95 {samples[-1]['p95_ms']:.2f} ms")
+            if use_tracemalloc and baseline_snapshot is None:
+                baseline_snapshot = take_snapshot()
+
+    pygame.quit()
+
+    if args.csv and samples:
+        with open(args.csv, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(samples[0].keys()))
+            writer.writeheader()
+            writer.writerows(samples)
+
+    flagged = report(samples, graphs_seen, len(exhibit.graphs), baseline_snapshot, logger)
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Filename: stats.py
+Purpose: Gameplay statistics store for the car plotter exhibit.
+Every completed pass (graph title, final score, duration and input source) is queued by the main loop and written to SQLite
+in batches on a background thread, together with incrementally updated aggregates (count, mean and score histogram per graph, per day).
+Run this file to query the statistics without scanning the logs:
+    python3 stats.py summary --days 7
+    python3 stats.py histogram --graph "Sine Function"
+"""
+
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from consts import STATS_DB_FILE, STATS_BATCH_SIZE, STATS_FLUSH_INTERVAL, STATS_HISTOGRAM_BUCKETS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS passes (
+    id INTEGER PRIMARY KEY,
+    ended_at REAL NOT NULL,
+    title TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    input_source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS graph_stats (
+    title TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    mean_score REAL NOT NULL,
+    mean_duration REAL NOT NULL,
+    min_score INTEGER NOT NULL,
+    max_score INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day TEXT NOT NULL,
+    title TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    score_sum INTEGER NOT NULL,
+    duration_sum REAL NOT NULL,
+    PRIMARY KEY (day, title)
+);
+CREATE TABLE IF NOT EXISTS score_histogram (
+    title TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (title, bucket)
+);
+"""
+
+UPDATE_GRAPH_STATS = """
+INSERT INTO graph_stats (title, count, mean_score, mean_duration, min_score, max_score) VALUES (?, 1, ?, ?, ?, ?)
+ON CONFLICT (title) DO UPDATE SET
+    count = count + 1,
+    mean_score = mean_score + (excluded.mean_score - mean_score) / (count + 1),
+    mean_duration = mean_duration + (excluded.mean_duration - mean_duration) / (count + 1),
+    min_score = MIN(min_score, excluded.min_score),
+    max_score = MAX(max_score, excluded.max_score)
+"""
+
+UPDATE_DAILY_STATS = """
+INSERT INTO daily_stats (day, title, count, score_sum, duration_sum) VALUES (?, ?, 1, ?, ?)
+ON CONFLICT (day, title) DO UPDATE SET
+    count = count + 1,
+    score_sum = score_sum + excluded.score_sum,
+    duration_sum = duration_sum + excluded.duration_sum
+"""
+
+UPDATE_HISTOGRAM = """
+INSERT INTO score_histogram (title, bucket, count) VALUES (?, ?, 1)
+ON CONFLICT (title, bucket) DO UPDATE SET count = count + 1
+"""
+
+
+def score_bucket(score, buckets=STATS_HISTOGRAM_BUCKETS):
+    """
+    Get the histogram bucket of a score (0 to 100). A score of 100 goes to the last bucket.
+    :param score: The score.
+    :param buckets: The number of buckets.
+    :return: The index of the bucket.
+    """
+    return min(buckets - 1, max(0, int(score * buckets / 100)))
+
+
+def connect(db_file=STATS_DB_FILE):
+    """
+    Open the statistics database and create the tables if needed.
+    :param db_file: Path of the SQLite file.
+    :return: The sqlite3 connection.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+    connection = sqlite3.connect(db_file)
+    connection.execute("PRAGMA journal_mode=WAL")  # readers (the query CLI) do not block the writer
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class StatsStore:
+    """
+    This class records completed passes. Recording only puts the pass in a queue, the writes are done in batches on a background thread,
+    so the main loop never waits for the disk.
+    """
+
+    def __init__(self, db_file=STATS_DB_FILE, batch_size=STATS_BATCH_SIZE, flush_interval=STATS_FLUSH_INTERVAL, logger=None):
+        """
+        Initialize the store and start the writer thread.
+        :param db_file: Path of the SQLite file.
+        :param batch_size: Maximum number of passes to write in one transaction.
+        :param flush_interval: Maximum number of seconds a pass waits in the queue before it is written.
+        :param logger: The logger to write errors to.
+        """
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logger
+
+        self.queue = queue.Queue()
+        self.available = True  # False if the database could not be opened, the passes are then dropped
+        self.thread = threading.Thread(target=self.run, name="stats-writer", daemon=True)
+        self.thread.start()
+
+    def record_pass(self, title, score, duration, input_source):
+        """
+        Record a completed pass (does not block).
+        :param title: The title of the graph.
+        :param score: The final score of the pass.
+        :param duration: The duration of the pass in seconds.
+        :param input_source: How the car was steered ("joystick", or "keyboard" for the keys and the mouse wheel).
+        """
+        if not self.available:
+            return  # the writer thread is gone, do not keep the passes in memory
+        self.queue.put((time.time(), title, int(score), float(duration), input_source))
+
+    def close(self):
+        """
+        Write the remaining passes and stop the writer thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        """
+        The writer thread: collect passes from the queue and write them in batches.
+        """
+        try:
+            connection = connect(self.db_file)
+        except (OSError, sqlite3.Error) as e:
+            if self.logger:
+                self.logger.info(f"Could not open the statistics store {self.db_file} ({e}), passes will not be recorded.")
+            self.available = False
+            while not self.queue.empty():
+                self.queue.get_nowait()  # drop the passes recorded before the error was noticed
+            return
+
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+
+            if batch:
+                try:
+                    self.write_batch(connection, batch)
+                except sqlite3.Error as e:
+                    if self.logger:
+                        self.logger.info(f"Failed to write {len(batch)} passes to the statistics store: {e}")
+
+        connection.close()
+
+    def write_batch(self, connection, batch):
+        """
+        Write a batch of passes and update the aggregates in one transaction.
+        :param connection: The sqlite3 connection.
+        :param batch: List of (ended_at, title, score, duration, input_source) tuples.
+        """
+        with connection:
+            connection.executemany(
+                "INSERT INTO passes (ended_at, title, score, duration, input_source) VALUES (?, ?, ?, ?, ?)", batch
+            )
+            connection.executemany(
+                UPDATE_GRAPH_STATS, [(title, score, duration, score, score) for _, title, score, duration, _ in batch]
+            )
+            connection.executemany(
+                UPDATE_DAILY_STATS,
+                [(date.fromtimestamp(ended_at).isoformat(), title, score, duration) for ended_at, title, score, duration, _ in batch]
+            )
+            connection.executemany(
+                UPDATE_HISTOGRAM, [(title, score_bucket(score)) for _, title, score, _, _ in batch]
+            )
+
+
+def summary(connection, days=None):
+    """
+    Get the number of passes, the mean score and the mean duration per graph.
+    :param connection: The sqlite3 connection.
+    :param days: If given, only count the last number of days (including today), otherwise all time.
+    :return: List of (title, count, mean score, mean duration) tuples.
+    """
+    if days is None:
+        return connection.execute(
+            "SELECT title, count, mean_score, mean_duration FROM graph_stats ORDER BY title"
+        ).fetchall()
+
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+    return connection.execute(
+        "SELECT title, SUM(count), CAST(SUM(score_sum) AS REAL) / SUM(count), SUM(duration_sum) / SUM(count) "
+        "FROM daily_stats WHERE day >= ? GROUP BY title ORDER BY title", (since,)
+    ).fetchall()
+
+
+def histogram(connection, title=None):
+    """
+    Get the score histogram.
+    :param connection: The sqlite3 connection.
+    :param title: If given, only the histogram of this graph, otherwise of all graphs together.
+    :return: List of counts, one per bucket.
+    """
+    if title is None:
+        rows = connection.execute("SELECT bucket, SUM(count) FROM score_histogram GROUP BY bucket").fetchall()
+    else:
+        rows = connection.execute("SELECT bucket, count FROM score_histogram WHERE title = ?", (title,)).fetchall()
+
+    counts = [0] * STATS_HISTOGRAM_BUCKETS
+    for bucket, count in rows:
+        counts[bucket] = count
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the car plotter gameplay statistics.")
+    parser.add_argument("--db", default=STATS_DB_FILE, help="path of the statistics database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = subparsers.add_parser("summary", help="passes, mean score and mean duration per graph")
+    summary_parser.add_argument("--days", type=int, help="only the last number of days (e.g. 7 for this week)")
+
+    histogram_parser = subparsers.add_parser("histogram", help="score histogram")
+    histogram_parser.add_argument("--graph", help="title of the graph (all graphs if not given)")
+
+    args = parser.parse_args()
+    connection = connect(args.db)
+
+    if args.command == "summary":
+        print(f"{'graph':<25}{'passes':>8}{'mean score':>12}{'mean duration [s]':>20}")
+        for title, count, mean_score, mean_duration in summary(connection, args.days):
+            print(f"{title:<25}{count:>8}{mean_score:>12.1f}{mean_duration:>20.1f}")
+
+    elif args.command == "histogram":
+        counts = histogram(connection, args.graph)
+        bucket_size = 100 / STATS_HISTOGRAM_BUCKETS
+        for bucket, count in enumerate(counts):
+            print(f"{bucket * bucket_size:5.0f}-{(bucket + 1) * bucket_size:<5.0f}{count:>8}")
+
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
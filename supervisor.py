@@ -0,0 +1,344 @@
+"""
+Filename: supervisor.py
+Purpose: Warm-standby supervisor for the car plotter exhibit.
+The supervisor runs the exhibit in a child process and keeps a second, standby process that has already initialized pygame,
+opened a hidden window, found the joysticks and loaded the assets and the graph caches.
+When the active process dies or its heartbeat stalls, the standby is promoted (it only has to show the window) and a new standby is started.
+The crash context and the restart latency are logged.
+
+Usage:
+    python3 supervisor.py
+Headless fault injection test (crash after 300 frames, give up after 3 restarts):
+    SDL_VIDEODRIVER=dummy python3 supervisor.py --inject-fault crash:300 --max-restarts 3
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+from consts import SUPERVISOR_HEARTBEAT_TIMEOUT, SUPERVISOR_POLL_INTERVAL, SUPERVISOR_READY_TIMEOUT, SUPERVISOR_RESPAWN_DELAY
+from logs import get_logger, get_queue_logger, write_queued_logs
+
+FAULTS = ("crash", "hang", "exit")  # faults that can be injected (see inject_fault)
+
+
+def parse_fault(text):
+    """
+    Parse a fault to inject, in the format KIND:FRAME (e.g. crash:300).
+    :param text: The text to parse.
+    :return: (kind, frame)
+    """
+    kind, _, frame = text.partition(":")
+    if kind not in FAULTS or not frame.isdigit():
+        raise argparse.ArgumentTypeError(f"Invalid fault {text}, expected KIND:FRAME with KIND one of {', '.join(FAULTS)}")
+    return kind, int(frame)
+
+
+def inject_fault(kind, logger):
+    """
+    Make the current exhibit process fail.
+    :param kind: "crash" raises an exception, "hang" stops the main loop (and the heartbeat), "exit" kills the process without cleanup.
+    :param logger: The logger to write to.
+    """
+    logger.info(f"Injecting fault: {kind}")
+    if kind == "crash":
+        raise RuntimeError("Injected crash")
+    elif kind == "hang":
+        while True:
+            time.sleep(1)
+    elif kind == "exit":
+        os._exit(3)
+
+
+def run_child(name, ready_event, go_event, heartbeat, crash_queue, log_queue, fault):
+    """
+    Entry point of an exhibit process. Loads everything with a hidden window, waits until it is promoted and then runs the main loop.
+    :param name: The name of the process (for the logs).
+    :param ready_event: Set when the process is loaded and ready to be promoted.
+    :param go_event: Set by the supervisor to promote the process.
+    :param heartbeat: Shared value, set to time.monotonic() after every frame.
+    :param crash_queue: Queue to send the traceback to if the process crashes.
+    :param log_queue: Queue to send the log records to, the supervisor writes them to the log file.
+    :param fault: (kind, frame) of a fault to inject, or None.
+    """
+    import pygame  # only the exhibit processes use pygame, not the supervisor
+    from main import setup_display, start_exhibit, run_main_loop
+
+    logger = get_queue_logger(log_queue)
+    try:
+        exhibit, joysticks = start_exhibit(logger, hidden=True)
+        ready_event.set()
+        logger.info(f"{name} is ready (standby)")
+
+        while not go_event.wait(1):
+            if not multiprocessing.parent_process().is_alive():
+                return  # the supervisor is gone, nobody will promote this process
+
+        screen, _ = setup_display()
+        exhibit.set_screen(screen)
+        exhibit.idle_detector.notify_input()
+        exhibit.reset_pass()
+        logger.info(f"{name} promoted to active")
+
+        def on_frame(frame):
+            heartbeat.value = time.monotonic()
+            if fault and frame == fault[1]:
+                inject_fault(fault[0], logger)
+
+        run_main_loop(exhibit, joysticks, logger, on_frame)
+
+    except Exception:
+        crash_queue.put(traceback.format_exc())  # logged once by the supervisor, next to the heartbeat and the restart latency
+        sys.exit(1)
+
+    pygame.quit()
+
+
+class ExhibitProcess:
+    """
+    This class holds an exhibit process and the objects the supervisor uses to talk to it.
+    """
+
+    def __init__(self, context, name, logger, fault=None):
+        """
+        Start an exhibit process (as a standby).
+        :param context: The multiprocessing context.
+        :param name: The name of the process (for the logs).
+        :param logger: The logger to write the log records of the process to.
+        :param fault: (kind, frame) of a fault to inject, or None.
+        """
+        self.name = name
+        self.logger = logger
+        self.ready_event = context.Event()
+        self.go_event = context.Event()
+        self.heartbeat = context.Value("d", 0.0, lock=False)  # written by the child only
+        self.crash_queue = context.Queue()
+        self.log_queue = context.Queue()  # one queue per process, a killed process cannot block the logs of the others
+
+        self.process = context.Process(target=run_child, name=name, daemon=True,
+                                       args=(name, self.ready_event, self.go_event, self.heartbeat, self.crash_queue, self.log_queue, fault))
+        self.process.start()
+        self.started_at = time.monotonic()
+        self.promoted_at = None
+
+    def promote(self):
+        """
+        Make the process the active one.
+        """
+        self.promoted_at = time.monotonic()
+        self.go_event.set()
+
+    def last_alive(self):
+        """
+        :return: time.monotonic() of the last heartbeat (or of the promotion if there was no heartbeat since).
+        """
+        return max(self.heartbeat.value, self.promoted_at or 0)
+
+    def write_logs(self):
+        """
+        Write the log records the process sent since the last call.
+        """
+        write_queued_logs(self.log_queue, self.logger)
+
+    def crash_report(self):
+        """
+        :return: The traceback sent by the process when it crashed, or None.
+        """
+        try:
+            return self.crash_queue.get(timeout=0.2)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        """
+        Stop the process (terminate, then kill if it does not stop) and write its last log records.
+        """
+        self.write_logs()
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.write_logs()
+
+
+class Supervisor:
+    """
+    This class keeps one active and one standby exhibit process, and promotes the standby when the active one fails.
+    """
+
+    def __init__(self, logger, fault=None, max_restarts=None, heartbeat_timeout=SUPERVISOR_HEARTBEAT_TIMEOUT, poll_interval=SUPERVISOR_POLL_INTERVAL):
+        """
+        Initialize the supervisor.
+        :param logger: The logger to write to.
+        :param fault: (kind, frame) of a fault to inject in every exhibit process, or None.
+        :param max_restarts: Stop after this number of restarts (None for no limit).
+        :param heartbeat_timeout: Seconds without a heartbeat after which the active process is considered stalled.
+        :param poll_interval: Seconds between two checks of the processes.
+        """
+        self.logger = logger
+        self.fault = fault
+        self.max_restarts = max_restarts
+        self.heartbeat_timeout = heartbeat_timeout
+        self.poll_interval = poll_interval
+
+        self.context = multiprocessing.get_context("spawn")  # fresh processes, the supervisor never initializes pygame
+        self.process_count = 0
+        self.restarts = 0
+        self.active = None
+        self.standby = None
+        self.standby_died_at = None
+
+    def spawn(self):
+        """
+        Start a new standby exhibit process.
+        :return: The ExhibitProcess object.
+        """
+        self.process_count += 1
+        return ExhibitProcess(self.context, f"exhibit-{self.process_count}", self.logger, self.fault)
+
+    def wait_ready(self, exhibit_process):
+        """
+        Wait until a process is loaded, starting new ones while they die during loading.
+        :param exhibit_process: The ExhibitProcess to wait for.
+        :return: The ExhibitProcess that is ready (not the given one if it died).
+        """
+        while True:
+            deadline = time.monotonic() + SUPERVISOR_READY_TIMEOUT
+            while time.monotonic() < deadline and exhibit_process.process.is_alive():
+                exhibit_process.write_logs()
+                if exhibit_process.ready_event.wait(self.poll_interval):
+                    return exhibit_process
+
+            self.log_failure(exhibit_process, "failed while loading")
+            exhibit_process.stop()
+            time.sleep(SUPERVISOR_RESPAWN_DELAY)
+            exhibit_process = self.spawn()
+
+    def check(self, exhibit_process):
+        """
+        Check the active process.
+        :param exhibit_process: The ExhibitProcess to check.
+        :return: None if it is fine, "closed" if it exited normally, otherwise a description of the failure.
+        """
+        if not exhibit_process.process.is_alive():
+            if exhibit_process.process.exitcode == 0:
+                return "closed"
+            return f"died with exit code {exhibit_process.process.exitcode}"
+
+        stalled = time.monotonic() - exhibit_process.last_alive()
+        if stalled > self.heartbeat_timeout:
+            return f"heartbeat stalled for {stalled:.2f} s"
+        return None
+
+    def log_failure(self, exhibit_process, failure, detected_at=None):
+        """
+        Log the context of a failed process.
+        :param exhibit_process: The ExhibitProcess that failed.
+        :param failure: Description of the failure.
+        :param detected_at: time.monotonic() when the failure was detected (now if None).
+        """
+        detected_at = detected_at or time.monotonic()
+        self.logger.info(f"{exhibit_process.name} (pid {exhibit_process.process.pid}) {failure}")
+        if exhibit_process.promoted_at:
+            self.logger.info(f"{exhibit_process.name} ran for {detected_at - exhibit_process.promoted_at:.1f} s, "
+                             f"last heartbeat {detected_at - exhibit_process.last_alive():.3f} s before the failure was detected")
+        report = exhibit_process.crash_report()
+        if report:
+            self.logger.info(f"{exhibit_process.name} traceback:\n{report}")
+
+    def failover(self, failure):
+        """
+        Replace the failed active process with the standby and start a new standby.
+        :param failure: Description of the failure.
+        """
+        detected_at = time.monotonic()
+        last_alive = self.active.last_alive()
+        failed = self.active
+        failed.stop()  # also frees what it held, e.g. the metrics port
+
+        warm = self.standby.ready_event.is_set()
+        self.active = self.wait_ready(self.standby)
+        self.active.promote()
+
+        # wait for the first frame of the promoted process to measure the restart latency
+        while self.active.heartbeat.value < detected_at and self.active.process.is_alive():
+            if time.monotonic() - detected_at > self.heartbeat_timeout:
+                break
+            time.sleep(0.001)
+        first_frame_at = time.monotonic()
+
+        self.log_failure(failed, failure, detected_at)  # after the promotion, reading the crash report may take a moment
+        self.logger.info(f"Promoted {self.active.name} ({'warm' if warm else 'cold'} standby): "
+                         f"{(first_frame_at - detected_at) * 1000:.0f} ms from detection to the first frame, "
+                         f"{(first_frame_at - last_alive) * 1000:.0f} ms since the last frame of the failed process")
+
+        self.standby = self.spawn()
+
+    def run(self):
+        """
+        Run the exhibit until it is closed normally or the restart limit is reached.
+        :return: The exit code of the supervisor.
+        """
+        self.logger.info("Starting supervisor")
+        self.active = self.wait_ready(self.spawn())
+        self.active.promote()
+        self.standby = self.spawn()
+
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+                self.active.write_logs()
+                self.standby.write_logs()
+
+                if not self.standby.process.is_alive():
+                    if self.standby_died_at is None:
+                        self.log_failure(self.standby, f"(standby) died with exit code {self.standby.process.exitcode}")
+                        self.standby_died_at = time.monotonic()
+                    elif time.monotonic() - self.standby_died_at > SUPERVISOR_RESPAWN_DELAY:
+                        self.standby = self.spawn()
+                        self.standby_died_at = None
+
+                failure = self.check(self.active)
+                if failure is None:
+                    continue
+                if failure == "closed":
+                    self.logger.info(f"{self.active.name} closed, stopping supervisor")
+                    return 0
+
+                if self.max_restarts is not None and self.restarts >= self.max_restarts:
+                    self.log_failure(self.active, failure)
+                    self.logger.info(f"Reached {self.max_restarts} restarts, stopping supervisor")
+                    return 1
+
+                self.restarts += 1
+                self.standby_died_at = None
+                self.failover(failure)
+
+        except KeyboardInterrupt:
+            self.logger.info("Supervisor interrupted")
+            return 0
+
+        finally:
+            for exhibit_process in (self.active, self.standby):
+                if exhibit_process:
+                    exhibit_process.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the car plotter exhibit with a warm standby process.")
+    parser.add_argument("--inject-fault", type=parse_fault, metavar="KIND:FRAME",
+                        help=f"make every exhibit process fail after FRAME frames, KIND is one of {', '.join(FAULTS)}")
+    parser.add_argument("--max-restarts", type=int, help="stop after this number of restarts")
+    args = parser.parse_args()
+
+    supervisor = Supervisor(get_logger(), fault=args.inject_fault, max_restarts=args.max_restarts)
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
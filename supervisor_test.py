@@ -0,0 +1,85 @@
+"""
+Filename: supervisor_test.py
+Purpose: Headless test of the warm-standby supervisor with the real exhibit processes.
+Runs the supervisor with the SDL dummy driver, injects a fault into every exhibit process
+and checks that the standby is promoted, draws its first frame and that the restart latency is logged.
+
+Usage:
+    python3 -m pytest supervisor_test.py
+"""
+
+import logging
+import re
+import pytest
+
+pytest.importorskip("pygame")
+
+from consts import SUPERVISOR_HEARTBEAT_TIMEOUT
+from supervisor import Supervisor, parse_fault
+
+FAULT_FRAME = 1000  # late enough for the standby to finish loading, so the promotion is warm
+
+
+class ListHandler(logging.Handler):
+    """
+    Logging handler that keeps the messages in a list.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def run_supervisor(monkeypatch, tmp_path, fault, max_restarts=1):
+    """
+    Run the supervisor headless until it gives up after max_restarts restarts.
+    :return: (exit code, list of log messages of the supervisor and the exhibit processes)
+    """
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")  # inherited by the exhibit processes
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    monkeypatch.setenv("CARPLOT_STATS_DB", str(tmp_path / "stats.db"))  # not the statistics of the checkout (see consts.py)
+
+    logger = logging.getLogger("supervisor_test")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = ListHandler()
+    logger.addHandler(handler)
+    try:
+        exit_code = Supervisor(logger, fault=parse_fault(fault), max_restarts=max_restarts).run()
+    finally:
+        logger.removeHandler(handler)
+    return exit_code, handler.messages
+
+
+@pytest.mark.parametrize("kind", ["crash", "hang", "exit"])
+def test_standby_is_promoted(monkeypatch, tmp_path, kind):
+    exit_code, messages = run_supervisor(monkeypatch, tmp_path, f"{kind}:{FAULT_FRAME}")
+    assert exit_code == 1  # the promoted process fails too, after max_restarts the supervisor gives up
+
+    # the log records of the exhibit processes reach the supervisor's log
+    assert "exhibit-1 promoted to active" in messages
+    assert "exhibit-2 promoted to active" in messages
+    if kind != "exit":  # os._exit does not wait for the last log records to be sent
+        assert messages.count(f"Injecting fault: {kind}") == 2
+    if kind == "crash":  # the traceback is logged once per crash, by the supervisor
+        assert sum("RuntimeError: Injected crash" in message for message in messages) == 2
+
+    promotions = [re.match(r"Promoted exhibit-2 \((\w+) standby\): (\d+) ms from detection to the first frame", message)
+                  for message in messages]
+    promotions = [promotion for promotion in promotions if promotion]
+    assert len(promotions) == 1
+    warmth, latency = promotions[0].group(1), int(promotions[0].group(2))
+    assert warmth == "warm"
+    assert latency < SUPERVISOR_HEARTBEAT_TIMEOUT * 1000  # the promoted process drew a frame before the wait timed out
+    assert (tmp_path / "stats.db").exists()  # the exhibit processes used the temporary statistics database
+
+
+def test_parse_fault():
+    assert parse_fault("crash:300") == ("crash", 300)
+    with pytest.raises(Exception):
+        parse_fault("explode:300")
+    with pytest.raises(Exception):
+        parse_fault("crash")
@@ -5,11 +5,38 @@ Purpose: User class for the car plotter exhibit. It handles the user movement, d
 
 import pygame
 from pygame.locals import *
-from consts import USER_GRAPH_COLOR, USER_GRAPH_MAX_POINTS, USER_GRAPH_STEP, USER_GRAPH_LINE_WIDTH, BLUE, YELLOW
-from asset_loader import convert_to_pixels
+import numpy as np
+from consts import USER_GRAPH_COLOR, USER_GRAPH_MAX_POINTS, USER_GRAPH_STEP, USER_GRAPH_LINE_WIDTH, SCORE_BAR, BLUE, YELLOW
+from asset_loader import convert_to_pixels, get_font
+
+
+def calc_scores(users, graph, max_error=100000):
+    """
+    Calculate the scores of many users on the same graph in one vectorized pass (see User.calc_score).
+    :param users: The list of User objects, their score attribute is updated.
+    :param graph: The graph object.
+    :param max_error: The maximum error allowed, used to normalize the score.
+    :return: The list of scores.
+    """
+    scoring = [user for user in users if len(user.user_points) >= 2]
+    if scoring:
+        windows = [user.user_points[-user.max_points:] for user in scoring]
+        lengths = np.array([len(window) for window in windows])
+        points = np.array([point for window in windows for point in window], dtype=float)
+
+        errors = (points[:, 1] - graph.values(points[:, 0])) ** 2  # squared errors of all users together
+        mse = np.add.reduceat(errors, np.concatenate(([0], np.cumsum(lengths)[:-1]))) / lengths
+        for user, user_mse in zip(scoring, mse):
+            user.score = round(max(0, 100 * (1 - user_mse / max_error)))
+
+    return [user.score for user in users]
+
 
 class User:
-    def __init__(self, screen, x_range, y_range, sub_surface, max_points=USER_GRAPH_MAX_POINTS, color=USER_GRAPH_COLOR, graph_line_width=USER_GRAPH_LINE_WIDTH, step=[USER_GRAPH_STEP, 10]):
+    gradient_bars = {}  # rendered score bars shared by all users, {(width, height): surface}
+    score_labels = {}  # rendered score texts shared by all users, {text: surface}
+
+    def __init__(self, screen, x_range, y_range, sub_surface, max_points=USER_GRAPH_MAX_POINTS, color=USER_GRAPH_COLOR, graph_line_width=USER_GRAPH_LINE_WIDTH, step=[USER_GRAPH_STEP, 10], bar=SCORE_BAR):
         """
         Initialize the user with a position, a list of points, and a step size.
         :param screen: The screen to draw on.
@@ -18,6 +45,7 @@ class User:
         :param sub_surface: (pos_x, pos_y, width, height) of the sub-surface (the area where the graph will be drawn).
         :param max_points: The maximum number of points to consider for the score calculation.
         :param color: The color of the graph.
+        :param bar: (pos_x, pos_y, width, height) of the score bar (percentages of the screen or pixels).
         """
         self.screen = screen  # The screen to draw on
         self.x_range = x_range  # Range of x values (min_x, max_x) (to normalize the graph)
@@ -27,20 +55,26 @@ class User:
         self.color = color  # Color of the graph
         self.graph_line_width = graph_line_width
         self.step = step  # Step size for x and y movements
+        self.bar = bar  # (pos_x, pos_y, width, height) of the score bar
 
         self.score = 0  # Initialize score to 0
         self.position = [self.x_range[0], self.y_range[1]]  # Initial position of the user
         self.user_points = []  # List to store user points
+        self.screen_points = []  # The user points in screen coordinates, appended together with user_points
 
         _, _, width, height = self.sub_surface
         self.scale = [width / (self.x_range[1] - self.x_range[0]), height / (self.y_range[1] - self.y_range[0])]  # Scale factors for x and y axes
 
+        self.bar_rect = (convert_to_pixels(bar[0], self.screen.get_width()), convert_to_pixels(bar[1], self.screen.get_height()),
+                         convert_to_pixels(bar[2], self.screen.get_width()), convert_to_pixels(bar[3], self.screen.get_height()))  # Score bar in pixels
+
     def reset(self):
         """
         Reset the user position and points.
         """
         self.position[0] = self.x_range[0]  # Reset x position to min_x
         self.user_points.clear()  # Clear user points
+        self.screen_points.clear()
     
     def move_x(self):
         """
@@ -69,6 +103,7 @@ class User:
 
     def add_point(self):
         self.user_points.append(self.position.copy())
+        self.screen_points.append(self.to_screen(self.position))  # converted once, not every frame
 
     def calc_score(self, graph, max_error=100000):
         """
@@ -83,114 +118,130 @@ class User:
         """
         if len(self.user_points) < 2:
             return 0
-        errors = [(y - graph.function(x))**2 for x, y in self.user_points[-self.max_points:]]  # Calculate the squared errors for the last max_points points
-        mse = sum(errors) / len(errors)
+        points = np.array(self.user_points[-self.max_points:], dtype=float)
+        errors = (points[:, 1] - graph.values(points[:, 0])) ** 2  # Calculate the squared errors for the last max_points points
+        mse = errors.mean()
         self.score = round(max(0, 100 * (1 - mse / max_error)))
         return self.score
     
-    def show_score(self, bar):
+    def to_screen(self, point):
+        """
+        Convert a point of the graph to screen coordinates.
+        :param point: (x, y) in graph values.
+        :return: (x, y) in pixels.
+        """
+        pos_x, pos_y, _, _ = self.sub_surface
+        return (pos_x + int((point[0] - self.x_range[0]) * self.scale[0]),
+                pos_y + int((point[1] - self.y_range[0]) * self.scale[1]))
+
+    def prepare_frame(self):
+        """
+        Calculate everything needed to draw the user in screen coordinates.
+        This does not touch pygame, so it can run off the display thread (see pipeline.py).
+        :return: A dictionary with the graph points, the car position, the start of the score window, the score and the bar height.
+        """
+        frame = {
+            "points": None,
+            "car": self.to_screen(self.position),
+            "window_start": None,
+            "score": self.score,
+            "label": f"{self.score}%",
+            "bar_height": int(self.bar_rect[3] * (max(0, min(100, self.score)) / 100)),  # Height of the score bar to draw
+        }
+
+        if len(self.screen_points) >= 2:
+            frame["points"] = self.screen_points[:]  # copy, the frame may be drawn while the next one is simulated (see pipeline.py)
+
+        if len(self.user_points) >= self.max_points:
+            frame["window_start"] = self.to_screen(self.user_points[-self.max_points])[0]
+        elif len(self.user_points) > 0:
+            frame["window_start"] = self.to_screen(self.user_points[0])[0]
+
+        return frame
+
+    def show_score(self, frame):
         """
         Display the score on the screen.
-        :param bar: (pos_x, pos_y, width, height) of the bar to draw the score.
+        :param frame: The dictionary from prepare_frame.
         """
 
-        def draw_gradient_bar(screen, pos_x, pos_y, width, height, value):
+        def get_gradient_bar(width, height):
             """
-            Draws a vertical bar with a green-to-red gradient based on the value (0–100).
-            :param screen: The screen to draw on.
-            :param pos_x: The x position of the bar.
-            :param pos_y: The y position of the bar.
+            Get a vertical bar with a green-to-red gradient. It is rendered once per size and shared by all users.
             :param width: The width of the bar.
             :param height: The height of the bar.
-            :param value: The value to represent (0–100).
+            :return: The surface of the full bar.
             """
-            # Clamp value between 0 and 100
-            value = max(0, min(100, value))
-            
-            # Height to draw based on value
-            visible_height = int(height * (value / 100))
-
-            # Draw gradient from bottom to top (red to green)
-            for i in range(visible_height):
-                # Interpolate color: red (255,0,0) to green (0,255,0)
-                ratio = i / height
-                r = int(255 * (1 - ratio))
-                g = int(255 * ratio)
-                color = (r, g, 0)
-
-                # Draw horizontal line (1-pixel high rect)
-                pygame.draw.rect(
-                    screen,
-                    color,
-                    pygame.Rect(pos_x, pos_y + height - i - 1, width, 1)
-                )
-
-        # Draw the gradient bar
-        pos_x = convert_to_pixels(bar[0], self.screen.get_width())
-        pos_y = convert_to_pixels(bar[1], self.screen.get_height())
-        width = convert_to_pixels(bar[2], self.screen.get_width())
-        height = convert_to_pixels(bar[3], self.screen.get_height())        
-        draw_gradient_bar(self.screen, pos_x, pos_y, width, height, self.score)
-
-        font = pygame.font.Font(None, 70)
-        text_surface = font.render(f"{self.score}%", True, (0, 0, 0))
+            if (width, height) not in User.gradient_bars:
+                gradient = pygame.Surface((width, height))
+
+                # Draw gradient from bottom to top (red to green)
+                for i in range(height):
+                    # Interpolate color: red (255,0,0) to green (0,255,0)
+                    ratio = i / height
+                    r = int(255 * (1 - ratio))
+                    g = int(255 * ratio)
+                    color = (r, g, 0)
+
+                    # Draw horizontal line (1-pixel high rect)
+                    pygame.draw.rect(gradient, color, pygame.Rect(0, height - i - 1, width, 1))
+
+                User.gradient_bars[(width, height)] = gradient
+            return User.gradient_bars[(width, height)]
+
+        # Draw the visible part of the gradient bar
+        pos_x, pos_y, width, height = self.bar_rect
+        visible_height = frame["bar_height"]
+        if visible_height > 0:
+            self.screen.blit(get_gradient_bar(width, height), (pos_x, pos_y + height - visible_height),
+                             pygame.Rect(0, height - visible_height, width, visible_height))
+
+        if frame["label"] not in User.score_labels:
+            User.score_labels[frame["label"]] = get_font(70).render(frame["label"], True, (0, 0, 0))
+        text_surface = User.score_labels[frame["label"]]
         text_rect = text_surface.get_rect(center=(pos_x + width // 2, pos_y - 30))
         self.screen.blit(text_surface, text_rect)  # Blit the text surface onto the main screen
 
-
-    def draw_graph(self):
+    def draw_graph(self, frame):
         """
         Draw the user's graph on the screen.
+        :param frame: The dictionary from prepare_frame.
         """
-        if len(self.user_points) < 2:
+        if frame["points"] is None:
             return
 
-        pos_x, pos_y, width, height = self.sub_surface  
-        graph_surface = pygame.Surface((width, height), pygame.SRCALPHA)  # Create a new surface with size of the sub-surface
-        graph_surface.fill((0, 0, 0, 0))  # Fill with transparent color
+        # Draw the line straight on the screen, clipped to the sub-surface
+        previous_clip = self.screen.get_clip()
+        self.screen.set_clip(pygame.Rect(self.sub_surface))
+        pygame.draw.lines(self.screen, self.color, False, frame["points"], self.graph_line_width)
+        self.screen.set_clip(previous_clip)
 
-        x_scale = width / (self.x_range[1] - self.x_range[0])  # Scale factor for x-axis
-        y_scale = height / (self.y_range[1] - self.y_range[0])  # Scale factor for y-axis
+    def draw_user_lines(self, frame):
+        """
+        Draw the lines from the user position to the edges of the graph.
+        :param frame: The dictionary from prepare_frame.
+        """
+        pos_x, pos_y, width, height = self.sub_surface
+        car_x, car_y = frame["car"]
 
-        screen_points = [(int((x - self.x_range[0]) * x_scale),
-                          int((y - self.y_range[0]) * y_scale)) for x, y in self.user_points]  # Convert to screen coordinates
-        pygame.draw.lines(graph_surface, self.color, False, screen_points, self.graph_line_width)  # Draw the line on the graph surface
+        pygame.draw.line(self.screen, BLUE, (car_x, car_y), (pos_x, car_y), 2)
+        pygame.draw.line(self.screen, BLUE, (car_x, car_y), (car_x, pos_y + height), 2)
+        pygame.draw.circle(self.screen, YELLOW, (car_x, car_y), 8)
 
-        self.screen.blit(graph_surface, (pos_x, pos_y))  # Blit the graph surface onto the main screen
+        if frame["window_start"] is not None:
+            pygame.draw.line(self.screen, (128, 128, 128), (frame["window_start"], pos_y + height), (car_x, pos_y + height), 8)
 
-    def draw_user_lines(self):
+    def render_frame(self, frame):
         """
-        Draw the lines from the user position to the edges of the graph.
+        Render all user elements of a prepared frame on the screen.
+        :param frame: The dictionary from prepare_frame.
         """
-        pos_x, pos_y, width, height = self.sub_surface
-        
-        pygame.draw.line(self.screen, BLUE, (pos_x + int((self.position[0] - self.x_range[0]) * self.scale[0]),
-                                                pos_y + int((self.position[1] - self.y_range[0]) * self.scale[1])),
-                                                (pos_x, pos_y + int((self.position[1] - self.y_range[0]) * self.scale[1])), 2)
-        pygame.draw.line(self.screen, BLUE, (pos_x + int((self.position[0] - self.x_range[0]) * self.scale[0]),
-                                                pos_y + int((self.position[1] - self.y_range[0]) * self.scale[1])),
-                                                (pos_x + int((self.position[0] - self.x_range[0]) * self.scale[0]),
-                                                pos_y + height), 2)
-        
-        pygame.draw.circle(self.screen, YELLOW, (pos_x + int((self.position[0] - self.x_range[0]) * self.scale[0]),
-                                                pos_y + int((self.position[1] - self.y_range[0]) * self.scale[1])), 8)
-        
-        if len(self.user_points) >= self.max_points:
-            pygame.draw.line(self.screen, (128, 128, 128), (pos_x + int((self.user_points[-self.max_points][0] - self.x_range[0]) * self.scale[0]),
-                                                    pos_y + height),
-                                                    (pos_x + int((self.position[0] - self.x_range[0]) * self.scale[0]),
-                                                    pos_y + height), 8)
-            
-        elif len(self.user_points) > 0:
-            pygame.draw.line(self.screen, (128, 128, 128), (pos_x + int((self.user_points[0][0] - self.x_range[0]) * self.scale[0]),
-                                                    pos_y + height),
-                                                    (pos_x + int((self.position[0] - self.x_range[0]) * self.scale[0]),
-                                                    pos_y + height), 8)
-            
+        self.draw_graph(frame)
+        self.show_score(frame)
+        self.draw_user_lines(frame)
+
     def render_all(self):
         """
         Render all user elements on the screen.
         """
-        self.draw_graph()
-        self.show_score(bar=("10%", "35%", "7%", "40%"))
-        self.draw_user_lines()
\ No newline at end of file
+        self.render_frame(self.prepare_frame())